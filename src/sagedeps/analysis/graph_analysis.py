@@ -4,9 +4,7 @@ from sagedeps.deps.data import Data
 from sagedeps.deps.filter import Filter, EmptyFilter
 from sagedeps.deps.model.sageclass import SageClass
 from sagedeps.deps.model.dependency import Relation
-import numpy as np
 import random
-from scipy import sparse
 import networkx as nx
 
 class GraphAnalyzer:
@@ -27,9 +25,9 @@ class GraphAnalyzer:
             ])
 
         classes = Data.get_classes_filtered(filter)
-        adj = np.zeros((len(classes), len(classes)))
 
         self._ids = [sc.full_path_name for sc in classes]
+        ids = set(self._ids)
 
         if weights is not None:
             weights_map = {
@@ -44,16 +42,9 @@ class GraphAnalyzer:
                 rel: 1 for rel in edge_types or range(6)
             }
 
-        sage_class: SageClass
-        for sage_class in classes:
-            for dep in sage_class.get_dependencies(edge_types):
-                if dep.target.full_path_name in self._ids:
-                    source_idx = self._ids.index(sage_class.full_path_name)
-                    dest_idx = self._ids.index(dep.target.full_path_name)
-                    weight = weights_map[dep.relation]
-                    adj[source_idx, dest_idx] = weight
-        
-        self._adjacency_matrix = sparse.csr_matrix(adj)
+        self._adjacency_matrix = Data.graph.adjacency(
+            [sc.graph_id for sc in classes], relations=edge_types, weights=weights_map
+        )
 
         G = nx.DiGraph()
 
@@ -63,7 +54,7 @@ class GraphAnalyzer:
 
         for sage_class in classes:
             for dep in sage_class.get_dependencies(edge_types):
-                if dep.target.full_path_name in self._ids:
+                if dep.target.full_path_name in ids:
                     G.add_edge(
                         sage_class.full_path_name,
                         dep.target.full_path_name, 
@@ -0,0 +1,2 @@
+from sagedeps.bench.synthetic import SyntheticTree
+from sagedeps.bench.parser_bench import ParserBenchmark, compare
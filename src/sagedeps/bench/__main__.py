@@ -0,0 +1,72 @@
+import json
+import tempfile
+from argparse import ArgumentParser
+
+from sagedeps.bench.parser_bench import ParserBenchmark, compare
+from sagedeps.bench.synthetic import SyntheticTree
+
+
+def main():
+    parser = ArgumentParser(
+        prog="python -m sagedeps.bench",
+        description="Benchmarks the sage-deps parser on a synthetic Sage-like source tree."
+    )
+    parser.add_argument("--files", type=int, default=500, help="Number of .py and .pyx modules.")
+    parser.add_argument("--classes-per-file", type=int, default=3, dest="classes_per_file")
+    parser.add_argument("--imports-per-class", type=int, default=4, dest="imports_per_class")
+    parser.add_argument(
+        "--lazy-import-density", type=float, default=0.2, dest="lazy_import_density",
+        help="Share of imports written as `lazy_import` calls."
+    )
+    parser.add_argument(
+        "--cython-share", type=float, default=0.3, dest="cython_share",
+        help="Share of modules written as .pyx files."
+    )
+    parser.add_argument("--packages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage, the fastest one is reported.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, dest="jobs", metavar="WORKERS")
+    parser.add_argument(
+        "--tree", metavar="DIRECTORY", dest="tree",
+        help="Write the synthetic tree to DIRECTORY and keep it, instead of a temporary directory."
+    )
+    parser.add_argument("-o", "--output-file", metavar="OUTPUT_FILE", dest="output_file")
+    parser.add_argument(
+        "--compare", metavar="BASELINE_FILE", dest="compare",
+        help="Print the speedup of each stage over an earlier result."
+    )
+    args = parser.parse_args()
+
+    tree = SyntheticTree(
+        files=args.files,
+        classes_per_file=args.classes_per_file,
+        imports_per_class=args.imports_per_class,
+        lazy_import_density=args.lazy_import_density,
+        cython_share=args.cython_share,
+        packages=args.packages,
+        seed=args.seed
+    )
+    if args.tree:
+        result = ParserBenchmark(tree.write(args.tree), repeat=args.repeat, workers=args.jobs).run()
+    else:
+        with tempfile.TemporaryDirectory() as root:
+            result = ParserBenchmark(tree.write(root), repeat=args.repeat, workers=args.jobs).run()
+    result["tree"] = tree.config()
+
+    output = json.dumps(result, indent=4)
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.loads(f.read())
+        if baseline.get("tree") != result["tree"]:
+            print("Warning: the baseline was run on a different tree.")
+        print(json.dumps(compare(baseline, result), indent=4))
+
+
+if __name__ == "__main__":
+    main()
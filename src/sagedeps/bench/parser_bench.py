@@ -0,0 +1,131 @@
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+from sagedeps.constants import Settings
+from sagedeps.deps.parser import Parser
+
+try:
+    import resource
+except ImportError:     # Not available on Windows
+    resource = None
+
+
+def process_peak_rss_kb() -> int | None:
+    """
+    Peak resident set size of this process so far in KiB, or `None` if it cannot be
+    measured. This never goes down, so it only tells which stage raised the peak, and it
+    does not include the worker processes.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class ParserBenchmark:
+    """
+    Times the parser stages on the Sage library found at `sage_base/src/sage`, typically a
+    tree written by `SyntheticTree`:
+
+    - `parse_python`: `Parser.parse_python` on every .py file,
+    - `parse_cython`: `Parser.parse_cython` on every .pyx file and its .pxd header,
+    - `resolve_import`: `Parser.resolve_import_record` on every import found by the two
+      stages above, with an empty memo,
+    - `create_python_module_class_map`: the whole `-gm` pipeline without the parse cache.
+
+    Each stage is run `repeat` times and the fastest run is reported, since slower runs
+    only measure noise from the rest of the machine. Memory is reported as the peak of the
+    whole process after each stage, see `process_peak_rss_kb`.
+    """
+    def __init__(self, sage_base: 'str | Path', repeat=3, workers=1):
+        self._sage_src = Path(sage_base)/"src"/"sage"
+        self._repeat = repeat
+        self._workers = workers
+
+    def _time(self, stage, items: int) -> dict:
+        best = None
+        for _ in range(self._repeat):
+            start = time.perf_counter()
+            stage()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return {
+            "seconds": round(best, 6),
+            "items": items,
+            "items_per_sec": round(items / best, 1) if best > 0 else None,
+            "process_peak_rss_kb": process_peak_rss_kb(),
+        }
+
+    def run(self) -> dict:
+        sage_src = Settings.SAGE_SRC
+        Settings.SAGE_SRC = self._sage_src
+        try:
+            return self._run()
+        finally:
+            Settings.SAGE_SRC = sage_src
+
+    def _run(self) -> dict:
+        python_files, cython_files = [], []
+        for dirpath, _, filenames in os.walk(self._sage_src):
+            for filename in sorted(filenames):
+                if filename.endswith(".py"):
+                    python_files.append(os.path.join(dirpath, filename))
+                elif filename.endswith(".pyx"):
+                    cython_files.append(os.path.join(dirpath, filename))
+
+        def parse_python():
+            return [(full_path, Parser.parse_python(full_path)) for full_path in python_files]
+
+        def parse_cython():
+            return [(full_path, Parser.parse_cython(*Parser.get_sources(full_path))) for full_path in cython_files]
+
+        records = []
+        for full_path, parsed in parse_python() + parse_cython():
+            module_name = Parser.pyfile_to_module(full_path)
+            records.extend((imp[1], module_name) for imp in parsed["imports"])
+            records.extend((imp[1], module_name) for c in parsed["classes"] for imp in c["imports"])
+
+        def resolve_import():
+            Parser._resolve_import_record.cache_clear()
+            for record, module_name in records:
+                Parser.resolve_import_record(record, module_name)
+
+        def create_module_class_map():
+            Parser._resolve_import_record.cache_clear()
+            Parser.create_python_module_class_map(workers=self._workers)
+
+        stages = {}
+        stages["parse_python"] = self._time(parse_python, len(python_files))
+        stages["parse_cython"] = self._time(parse_cython, len(cython_files))
+        stages["resolve_import"] = self._time(resolve_import, len(records))
+        stages["create_python_module_class_map"] = self._time(
+            create_module_class_map, len(python_files) + len(cython_files)
+        )
+
+        return {
+            "version": 1,
+            "parser_version": Parser.VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workers": self._workers,
+            "files": len(python_files) + len(cython_files),
+            "files_per_sec": stages["create_python_module_class_map"]["items_per_sec"],
+            "process_peak_rss_kb": process_peak_rss_kb(),
+            "stages": stages,
+        }
+
+
+def compare(baseline: dict, result: dict) -> dict:
+    """
+    Returns the speedup of each stage of `result` over `baseline` (above 1 is faster).
+    """
+    speedups = {}
+    for stage, timing in result["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base is not None and timing["seconds"] > 0:
+            speedups[stage] = round(base["seconds"] / timing["seconds"], 3)
+    return speedups
@@ -0,0 +1,224 @@
+import random
+from pathlib import Path
+
+
+class SyntheticTree:
+    """
+    Generates a deterministic Sage-like source tree for benchmarking the parser. The tree
+    is laid out like `SAGE_BASE/src/sage`: `packages` packages, each with an `__init__.py`
+    and an `all.py`, and `files` modules spread over them. A `cython_share` of the modules
+    are .pyx files, half of which have a .pxd header.
+
+    Every module defines `classes_per_file` classes. Each class inherits from a class of an
+    earlier module, and its body imports and uses `imports_per_class` classes of other
+    modules, through top-level imports, `lazy_import` calls (with probability
+    `lazy_import_density`), module imports, relative imports and imports in methods.
+    Docstrings, comments and string literals mentioning other names are sprinkled in, so
+    the lexer and the symbol extraction do realistic work. The same parameters and `seed`
+    always produce the same tree.
+    """
+    def __init__(
+        self, files=500, classes_per_file=3, imports_per_class=4, lazy_import_density=0.2,
+        cython_share=0.3, packages=10, seed=0
+    ):
+        self.files = files
+        self.classes_per_file = classes_per_file
+        self.imports_per_class = imports_per_class
+        self.lazy_import_density = lazy_import_density
+        self.cython_share = cython_share
+        self.packages = packages
+        self.seed = seed
+
+    def config(self) -> dict:
+        return {
+            "files": self.files,
+            "classes_per_file": self.classes_per_file,
+            "imports_per_class": self.imports_per_class,
+            "lazy_import_density": self.lazy_import_density,
+            "cython_share": self.cython_share,
+            "packages": self.packages,
+            "seed": self.seed,
+        }
+
+    def write(self, root: 'str | Path') -> Path:
+        """
+        Writes the tree under `root` and returns the `SAGE_BASE` directory, i.e. `root`.
+        The library itself is in `root/src/sage`.
+        """
+        rng = random.Random(self.seed)
+        root = Path(root)
+        sage_src = root/"src"/"sage"
+
+        modules = []
+        for i in range(self.files):
+            package = f"pkg{i % self.packages}"
+            cython = rng.random() < self.cython_share
+            header = cython and rng.random() < 0.5
+            classes = [f"{'C' if cython else 'P'}{i}_{k}" for k in range(self.classes_per_file)]
+            modules.append((package, f"mod{i}", cython, header, classes))
+
+        for p in range(self.packages):
+            package_dir = sage_src/f"pkg{p}"
+            package_dir.mkdir(parents=True, exist_ok=True)
+            (package_dir/"__init__.py").write_text("")
+        (sage_src/"__init__.py").write_text("")
+
+        for i, (package, name, cython, header, classes) in enumerate(modules):
+            path = sage_src/package/name
+            if cython:
+                path.with_suffix(".pyx").write_text(self._cython_module(rng, modules, i))
+                if header:
+                    path.with_suffix(".pxd").write_text(self._cython_header(rng, modules, i))
+            else:
+                path.with_suffix(".py").write_text(self._python_module(rng, modules, i))
+
+        for p in range(self.packages):
+            package = f"pkg{p}"
+            lines = ["from sage.misc.lazy_import import lazy_import", ""]
+            for other_package, name, _, _, classes in modules:
+                if other_package == package:
+                    lines.append(f"from sage.{package}.{name} import {', '.join(classes)}")
+            (sage_src/package/"all.py").write_text("\n".join(lines) + "\n")
+
+        return root
+
+    def _imported(self, rng: random.Random, modules: list, i: int, count: int) -> list:
+        """
+        Picks `count` classes from other modules as `(package, module, class)`.
+        """
+        picks = []
+        for _ in range(count):
+            package, name, _, _, classes = modules[rng.randrange(len(modules))]
+            picks.append((package, name, rng.choice(classes)))
+        return picks
+
+    def _python_module(self, rng: random.Random, modules: list, i: int) -> str:
+        package, name, _, _, classes = modules[i]
+        lines = [
+            '"""',
+            f"Synthetic module {name}.",
+            "",
+            "EXAMPLES::",
+            "",
+            f"    sage: from sage.{package}.{name} import {classes[0]}",
+            f"    sage: {classes[0]}()",
+            '"""',
+            "from sage.misc.lazy_import import lazy_import",
+            "",
+        ]
+        body = []
+        for k, class_name in enumerate(classes):
+            imports = self._imported(rng, modules, i, self.imports_per_class)
+            used = []
+            for j, (other_package, other_name, other_class) in enumerate(imports):
+                alias = f"{other_class}_{k}_{j}"
+                kind = rng.random()
+                if kind < self.lazy_import_density:
+                    lines.append(f"lazy_import('sage.{other_package}.{other_name}', '{other_class}', '{alias}')")
+                    used.append(alias)
+                elif kind < self.lazy_import_density + 0.15:
+                    lines.append(f"import sage.{other_package}.{other_name} as m_{k}_{j}")
+                    used.append(f"m_{k}_{j}.{other_class}")
+                elif kind < self.lazy_import_density + 0.3 and other_package == package:
+                    lines.append(f"from .{other_name} import {other_class} as {alias}")
+                    used.append(alias)
+                else:
+                    lines.append(f"from sage.{other_package}.{other_name} import {other_class} as {alias}")
+                    used.append(alias)
+
+            base = used[0] if used and rng.random() < 0.7 else "object"
+            body += [
+                "",
+                f"class {class_name}({base}):",
+                '    """',
+                f"    Synthetic class, see :class:`{used[-1] if used else 'object'}`.",
+                '    """',
+                "    def __init__(self, *args, **kwds):",
+                f"        self._parent = {used[-1] if used else 'object'}(*args)",
+                "        self._cache = {}",
+                "",
+            ]
+            for j, symbol in enumerate(used):
+                body += [
+                    f"    def method_{j}(self, x):",
+                    f"        # Calls {symbol} on x",
+                    f"        y = {symbol}(x)",
+                    f"        return y.value + self._cache.get('{symbol}', 0)",
+                    "",
+                ]
+            other_package, other_name, other_class = self._imported(rng, modules, i, 1)[0]
+            body += [
+                "    def _local_import(self):",
+                f"        from sage.{other_package}.{other_name} import {other_class}",
+                f"        return {other_class}(self)",
+            ]
+
+        body += ["", f"instance_{i} = {classes[0]}()", f"Alias_{i} = {classes[-1]}"]
+        return "\n".join(lines + body) + "\n"
+
+    def _cython_module(self, rng: random.Random, modules: list, i: int) -> str:
+        package, name, _, _, classes = modules[i]
+        lines = [
+            "# distutils: language = c++",
+            '"""',
+            f"Synthetic Cython module {name}.",
+            '"""',
+            "from cysignals.signals cimport sig_on, sig_off",
+            "from sage.misc.lazy_import import lazy_import",
+            "",
+        ]
+        body = []
+        for k, class_name in enumerate(classes):
+            imports = self._imported(rng, modules, i, self.imports_per_class)
+            used = []
+            for j, (other_package, other_name, other_class) in enumerate(imports):
+                alias = f"{other_class}_{k}_{j}"
+                kind = rng.random()
+                if kind < self.lazy_import_density:
+                    lines.append(f"lazy_import('sage.{other_package}.{other_name}', '{other_class}', '{alias}')")
+                elif kind < self.lazy_import_density + 0.2:
+                    lines.append(f"from sage.{other_package}.{other_name} cimport {other_class} as {alias}")
+                else:
+                    lines.append(f"from sage.{other_package}.{other_name} import {other_class} as {alias}")
+                used.append(alias)
+
+            base = used[0] if used and rng.random() < 0.7 else "object"
+            body += [
+                "",
+                f"cdef class {class_name}({base}):",
+                '    r"""',
+                f"    Synthetic class, see :class:`{used[-1] if used else 'object'}`.",
+                "",
+                "    EXAMPLES::",
+                "",
+                f"        sage: {class_name}()  # not tested",
+                '    """',
+                "    def __init__(self, parent):",
+                f"        self._parent = {used[-1] if used else 'object'}(parent)",
+                "",
+                "    cpdef int degree(self) except -1:",
+                "        return 0",
+                "",
+            ]
+            for j, symbol in enumerate(used):
+                body += [
+                    f"    def method_{j}(self, x, y=None,",
+                    "                 z=None):",
+                    f"        cdef object result = {symbol}(x)  # '{symbol}' in a comment",
+                    "        sig_on()",
+                    "        sig_off()",
+                    '        return result if y is None else "(%s)" % y',
+                    "",
+                ]
+
+        body += ["", f"instance_{i} = {classes[0]}(None)", f"Alias_{i} = {classes[-1]}"]
+        return "\n".join(lines + body) + "\n"
+
+    def _cython_header(self, rng: random.Random, modules: list, i: int) -> str:
+        _, _, _, _, classes = modules[i]
+        lines = []
+        for other_package, other_name, other_class in self._imported(rng, modules, i, 2):
+            lines.append(f"from sage.{other_package}.{other_name} cimport {other_class}")
+        for class_name in classes:
+            lines += ["", f"cdef class {class_name}:", "    cdef object _parent", "    cpdef int degree(self) except -1"]
+        return "\n".join(lines) + "\n"
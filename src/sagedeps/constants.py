@@ -1,5 +1,6 @@
 import json
 import subprocess
+import sys
 from pathlib import Path
 
 class Settings:
@@ -21,8 +22,14 @@ class Settings:
             return base_dir/pathname
 
         cls.SAGE_BASE = get_path(config.get("sage_path",  "../sage"))
-        # If Sage is not installed at this location, install it
-        if not cls.SAGE_BASE.is_dir():
+        # If Sage is not installed at this location, install it. Without a terminal to ask
+        # (for example in CI), the clone is skipped.
+        if not cls.SAGE_BASE.is_dir() and not sys.stdin.isatty():
+            print(
+                f"Sage installation not found at {cls.SAGE_BASE}. Parts of sage-deps will not work without it.",
+                file=sys.stderr
+            )
+        elif not cls.SAGE_BASE.is_dir():
             do_clone = input(f"Sage installation not found at {cls.SAGE_BASE}. Would you like to clone it? [y/n]").lower()
             while do_clone not in "yn":
                 do_clone = input(f"Please respond with [y/n]").lower()
@@ -36,6 +43,8 @@ class Settings:
         cls.SAGE_SRC = cls.SAGE_BASE/"src"/"sage"
         cls.MODULE_JSON_SRC = get_path(config.get("modules_src",  "resources/modules.json"))
         cls.MODULE_JSON_SRC_TEST = project_root/"resources"/"modules_tmp.json"
+        cls.PARSE_CACHE = get_path(config.get("parse_cache_src", "resources/parse_cache.json"))
+        cls.SNAPSHOT = get_path(config.get("snapshot_src", "resources/snapshot.pickle"))
         cls.IMPORT_MAP_SRC = project_root/"resources"/"imports.json"
         cls.DEPENDENCIES_JSON = project_root/"resources"/"dependencies.json"
         cls.GRAPH_DIR = get_path(config.get("graph_src", "graphics"))
@@ -43,6 +52,7 @@ class Settings:
         cls.FILTER_JSON = get_path(config.get("filter_src", "resources/filter.json"))
         cls.COMMIT_HISTORY = project_root/"resources"/"commits.txt"
         cls.COMMIT_METADATA = project_root/"resources"/"commit_metadata.json"
+        cls.HISTORY_JSON = get_path(config.get("history_src", "resources/history.jsonl"))
         cls.LOCAL_DOC_ROOT = cls.SAGE_BASE/"src"/"doc"/"en"/"reference"
         cls.DOC_BASE_URL = "https://doc.sagemath.org/html/en/reference"
     
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List
+
+
+class ParseCache:
+    """
+    Persistent on-disk cache of per-file parser output, used to regenerate `modules.json`
+    incrementally. Entries are keyed by the path of the parsed file and remember the
+    `(mtime, size, sha1)` of every source file that went into them (a .pyx file and its
+    .pxd header, for example).
+
+    A lookup first compares `mtime` and `size`, which only needs a `stat`. If those differ,
+    the content hash is compared before the entry is declared stale, so touching a file
+    without changing it does not force a re-parse.
+    """
+    def __init__(self, path: 'str | Path', version: int = 0):
+        self._path = Path(path)
+        self._version = version
+        self._entries = {}
+        self._dirty = False
+
+        if self._path.is_file():
+            try:
+                with open(self._path, "r") as f:
+                    data = json.loads(f.read())
+            except (OSError, ValueError):
+                print(f"Could not read parse cache {self._path}. Rebuilding it.")
+                return
+            if data.get("version") == self._version:
+                self._entries = data.get("entries", {})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def get(self, key: str, sources: List[str]) -> dict | None:
+        """
+        Returns the cached entry for `key` if none of its `sources` changed, otherwise `None`.
+        """
+        cached = self._entries.get(key)
+        if cached is None or [source[0] for source in cached["sources"]] != sources:
+            return None
+
+        for source in cached["sources"]:
+            path, mtime, size, digest = source
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            if stat.st_mtime_ns == mtime and stat.st_size == size:
+                continue
+            if self._hash_file(path) != digest:
+                return None
+            source[1], source[2] = stat.st_mtime_ns, stat.st_size
+            self._dirty = True
+
+        return cached["entry"]
+
+    def put(self, key: str, sources: List[str], entry: dict):
+        fingerprints = []
+        for path in sources:
+            stat = os.stat(path)
+            fingerprints.append([path, stat.st_mtime_ns, stat.st_size, self._hash_file(path)])
+        self._entries[key] = {"sources": fingerprints, "entry": entry}
+        self._dirty = True
+
+    def prune(self, keys):
+        """
+        Drops every entry whose key is not in `keys`, i.e. files that were removed.
+        """
+        keys = set(keys)
+        for key in [key for key in self._entries if key not in keys]:
+            del self._entries[key]
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_name(self._path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps({"version": self._version, "entries": self._entries}))
+        os.replace(tmp_path, self._path)
+        self._dirty = False
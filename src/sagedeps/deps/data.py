@@ -1,4 +1,6 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Iterable
+if TYPE_CHECKING:
+    from sagedeps.deps.graph import GraphCore
 
 from sagedeps.deps.model.module import Module
 from sagedeps.deps.model.sageclass import SageClass
@@ -11,7 +13,41 @@ class Data:
     instantiations = {}
     aliases = {}
     commit_metadata = {}
-    rst_content = {}
+    rst_index = {}
+    graph: 'GraphCore | None' = None
+
+    # Callbacks filling a field the first time it is read, see `set_provider`
+    _providers = {}
+
+    # Final target of every alias and instantiation, see `finalize_references`
+    _resolved_references = None
+
+    @classmethod
+    def clear(cls):
+        """
+        Removes every module, class and reference. Commit metadata and documentation index
+        are kept, since they do not come from the module map.
+        """
+        cls.modules = {}
+        cls.classes = {}
+        cls.instantiations = {}
+        cls.aliases = {}
+        cls.graph = None
+        cls._resolved_references = None
+
+    @classmethod
+    def set_provider(cls, field: str, provider):
+        """
+        Registers `provider` to be called once, the first time `field` is read, so data that
+        few commands need (such as commit metadata) is only loaded on demand.
+        """
+        cls._providers[field] = provider
+
+    @classmethod
+    def provide(cls, field: str):
+        provider = cls._providers.pop(field, None)
+        if provider is not None:
+            provider()
 
     @classmethod
     def add_module(cls, full_module_name: str, module: 'Module'):
@@ -21,6 +57,18 @@ class Data:
     def add_class(cls, full_path_name: str, sageclass: 'SageClass'):
         cls.classes[full_path_name] = sageclass
 
+    @classmethod
+    def remove_module(cls, full_module_name: str):
+        cls.modules.pop(full_module_name, None)
+
+    @classmethod
+    def remove_class(cls, full_path_name: str, sageclass: 'SageClass'):
+        """
+        Removes `sageclass`, unless another class was added under the same name since.
+        """
+        if cls.classes.get(full_path_name) is sageclass:
+            del cls.classes[full_path_name]
+
     @classmethod
     def get_module(cls, full_module_name: str) -> 'Module | None':
         return cls.modules.get(full_module_name, None)
@@ -33,20 +81,80 @@ class Data:
     @classmethod
     def add_instantiation(cls, full_path_name: str, referenced_name: str):
         cls.instantiations[full_path_name] = referenced_name
+        cls._resolved_references = None
     
     @classmethod
     def add_alias(cls, full_path_name: str, referenced_name: str):
         cls.aliases[full_path_name] = referenced_name
+        cls._resolved_references = None
+
+    @classmethod
+    def remove_reference(cls, full_path_name: str):
+        """
+        Removes the alias or instantiation named `full_path_name`.
+        """
+        cls.instantiations.pop(full_path_name, None)
+        cls.aliases.pop(full_path_name, None)
+        cls._resolved_references = None
+
+    @classmethod
+    def finalize_references(cls):
+        """
+        Resolves every alias and instantiation to its final target at once: alias chains are
+        followed to their end, then an instantiation there is followed once. Every alias on
+        a chain is resolved by the same walk, so each one is only visited once.
+
+        Alias cycles are reported, and the names on them (or leading to them) resolve to
+        themselves.
+        """
+        alias_ends = {}
+        cyclic = set()
+        for name in cls.aliases:
+            if name in alias_ends:
+                continue
+            path = []
+            on_path = set()
+            current = name
+            while current in cls.aliases and current not in alias_ends:
+                if current in on_path:
+                    cycle = path[path.index(current):] + [current]
+                    print(f"Alias cycle: {' -> '.join(cycle)}")
+                    break
+                path.append(current)
+                on_path.add(current)
+                current = cls.aliases[current]
+            else:
+                if current not in cyclic:
+                    end = alias_ends.get(current, current)
+                    for alias in path:
+                        alias_ends[alias] = end
+                    continue
+            for alias in path:
+                alias_ends[alias] = alias
+            cyclic.update(path)
+
+        resolved = {}
+        for name in cls.instantiations:
+            resolved[name] = cls.instantiations[name]
+        for name, end in alias_ends.items():
+            resolved[name] = cls.instantiations.get(end, end)
+        cls._resolved_references = resolved
     
     @classmethod
     def resolve_reference(cls, full_path_name: str) -> str:
-        resolved_name = full_path_name
-        while resolved_name in cls.aliases:
-            resolved_name = cls.aliases[resolved_name]
-        if resolved_name in cls.instantiations:
-            resolved_name = cls.instantiations[resolved_name]
-        
-        return resolved_name
+        if cls._resolved_references is None:
+            cls.finalize_references()
+        return cls._resolved_references.get(full_path_name, full_path_name)
+
+    @classmethod
+    def resolve_references(cls, full_path_names: 'Iterable[str]') -> list[str]:
+        """
+        Resolves many names at once, see `resolve_reference`.
+        """
+        if cls._resolved_references is None:
+            cls.finalize_references()
+        resolved = cls._resolved_references
+        return [resolved.get(full_path_name, full_path_name) for full_path_name in full_path_names]
     
     @classmethod
     def get_classes_filtered(cls, filter: Filter = EmptyFilter()) -> list[SageClass]:
@@ -56,22 +164,29 @@ class Data:
     def get_modules_filtered(cls, filter: Filter = EmptyFilter()) -> list[Module]:
         return filter.apply(cls.modules.values())
 
+    @classmethod
+    def set_graph(cls, graph: 'GraphCore'):
+        cls.graph = graph
+
     @classmethod
     def set_commit_metadata(cls, metadata: dict):
         cls.commit_metadata = metadata
     
     @classmethod
     def get_commit_metadata(cls, full_path_name: str) -> dict:
+        cls.provide("commit_metadata")
         resolved_name = cls.resolve_reference(full_path_name)
         return cls.commit_metadata.get(resolved_name, None)
 
     @classmethod
-    def set_rst_content(cls, content: dict):
-        cls.rst_content = content
+    def set_rst_index(cls, index: dict):
+        cls.rst_index = index
     
     @classmethod
-    def get_rst_references(cls, full_path_name: str):
+    def get_rst_references(cls, full_path_name: str) -> list[str]:
+        """
+        Returns the reference sections documenting a module, given its full path name.
+        """
+        cls.provide("rst_index")
         resolved_name = cls.resolve_reference(full_path_name).replace(".", "/")
-        return [
-            reference for reference, content in cls.rst_content.items() if resolved_name in content
-        ]
\ No newline at end of file
+        return cls.rst_index.get(resolved_name, [])
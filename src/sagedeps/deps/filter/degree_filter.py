@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 from typing import List
-from sagedeps.deps.model.dependency import Relation
+from sagedeps.deps.model.dependency import Relation, relation_mask
 if TYPE_CHECKING:
     from sagedeps.deps.model.importable import Importable
 
@@ -18,10 +18,11 @@ class MinFanIn(Filter):
             ]
         else:
             self._relations = relations
+        self._relation_mask = relation_mask(self._relations)
         self._deg = deg
 
     def _applies_to_self(self, object: 'Importable') -> bool:
-        return object.in_degree(self._relations) >= self._deg
+        return object.in_degree(self._relation_mask) >= self._deg
     
     @classmethod
     def from_json(cls, data, filters: list[dict]) -> "Filter":
@@ -53,10 +54,11 @@ class MinFanOut(Filter):
             ]
         else:
             self._relations = relations
+        self._relation_mask = relation_mask(self._relations)
         self._deg = deg
 
     def _applies_to_self(self, object: 'Importable') -> bool:
-        return object.out_degree(self._relations) >= self._deg
+        return object.out_degree(self._relation_mask) >= self._deg
     
     @classmethod
     def from_json(cls, data, filters: list[dict]) -> "Filter":
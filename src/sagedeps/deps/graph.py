@@ -0,0 +1,497 @@
+from typing import TYPE_CHECKING, Iterable, List
+if TYPE_CHECKING:
+    from sagedeps.deps.model.module import Module
+    from sagedeps.deps.model.sageclass import SageClass
+
+import numpy as np
+
+from sagedeps.deps.inheritance import InheritanceClosure
+from sagedeps.deps.model.dependency import ALL_RELATIONS, Dependency, Relation, relation_mask
+
+
+RELATIONS = {relation.value: relation for relation in Relation}
+NUM_RELATIONS = max(Relation) + 1
+
+
+class GraphCore:
+    """
+    The dependency graph in compressed sparse row form. Classes and modules are numbered
+    with dense integer IDs, and the edges of class `i` are `targets[indptr[i]:indptr[i + 1]]`
+    with their relations in the parallel `relations` array, in the order the class recorded
+    them. An edge costs 5 bytes per direction instead of a `Dependency` object.
+
+    Each row is split into one bucket per relation, strongest relation first, which is the
+    order `SageClass.get_filter_dependencies` leaves the out-edges in. A bucket is given by
+    its start and its count in `(classes, relations)` arrays. Sets of relations are passed
+    as bitmasks (see `relation_mask`), and the degrees of every class are cached per mask,
+    so a degree query is a list lookup.
+
+    Classes are numbered in the pre-order of their file in the module tree, so the classes
+    under a module have consecutive IDs, see `class_range`. The degree of a module is then
+    a difference of running totals, cached per mask for every module at once.
+
+    The in-edges are the dependents recorded by each class. These also keep the links that
+    `SageClass.get_filter_dependencies` dropped from the out-edges, so they are stored as
+    they are rather than as the transpose of the out-edges.
+
+    The transitive closure of the inheritance edges, see `inheritance`, is computed the
+    first time it is needed.
+
+    Built once at the end of `Loader.create_dependencies`, after which `SageClass` reads its
+    dependencies and dependents, and `Module` its degrees, from here. When some files change,
+    `update` builds the next graph from this one and the dependency lists of the classes
+    that have to be recomputed.
+    """
+    def __init__(
+        self,
+        classes: 'List[SageClass]',
+        modules: 'List[Module]',
+        out_edges: 'tuple[np.ndarray, np.ndarray, np.ndarray] | None' = None,
+        in_edges: 'tuple[np.ndarray, np.ndarray, np.ndarray] | None' = None
+    ):
+        """
+        `out_edges` and `in_edges` are `(rows, endpoints, relations)` arrays. By default they
+        are read from the dependency and dependent lists of `classes`.
+        """
+        self.classes = classes
+        self.modules = modules
+        # Keyed by `id()`, since model objects hash by name, which is slow and unavailable
+        # while a snapshot is being restored
+        class_ids = {id(sage_class): i for i, sage_class in enumerate(classes)}
+        if out_edges is None:
+            out_edges = self._edge_arrays(
+                [sage_class._dependencies for sage_class in classes], lambda dep: class_ids[id(dep.target)]
+            )
+        if in_edges is None:
+            in_edges = self._edge_arrays(
+                [sage_class._dependents for sage_class in classes], lambda dep: class_ids[id(dep.source)]
+            )
+        module_ids = {id(module): i for i, module in enumerate(modules)}
+        self.class_module = np.array(
+            [module_ids.get(id(sage_class.module), -1) for sage_class in classes], dtype=np.int32
+        )
+
+        # Classes are sorted by the Euler tour number of their file, so the classes under a
+        # module are the ones between the numbers of the module
+        class_pre = np.array([self._module_pre(sage_class.module) for sage_class in classes])
+        intervals = np.array(
+            [module.interval or (-1, -1) for module in modules], dtype=np.float64
+        ).reshape(-1, 2)
+        numbered = intervals[:, 0] >= 0
+        self.module_starts = np.where(numbered, np.searchsorted(class_pre, intervals[:, 0]), -1).astype(np.int32)
+        self.module_ends = np.where(numbered, np.searchsorted(class_pre, intervals[:, 1]), -1).astype(np.int32)
+
+        (
+            self.out_indptr, self.out_targets, self.out_relations, self.out_starts, self.out_counts
+        ) = self._compress(len(classes), *out_edges)
+        (
+            self.in_indptr, self.in_sources, self.in_relations, self.in_starts, self.in_counts
+        ) = self._compress(len(classes), *in_edges)
+        # Running totals of the bucket sizes over the class IDs, per relation, so the edges of
+        # the classes under a module are the difference between its two ends
+        self.out_totals = np.zeros((len(classes) + 1, NUM_RELATIONS), dtype=np.int64)
+        np.cumsum(self.out_counts, axis=0, out=self.out_totals[1:])
+        self.in_totals = np.zeros((len(classes) + 1, NUM_RELATIONS), dtype=np.int64)
+        np.cumsum(self.in_counts, axis=0, out=self.in_totals[1:])
+        self._init_caches()
+
+    def _init_caches(self):
+        # Plain lists, since indexing them is much faster than indexing arrays
+        self._degrees = {}
+        self._module_degrees = {}
+        self._inheritance = None
+        self._bucket_lists = {
+            "out": (self.out_starts.tolist(), self.out_counts.tolist(), self.out_targets.tolist()),
+            "in": (self.in_starts.tolist(), self.in_counts.tolist(), self.in_sources.tolist()),
+        }
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        del state["_degrees"], state["_module_degrees"], state["_inheritance"], state["_bucket_lists"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._init_caches()
+
+    @classmethod
+    def build(cls, classes: 'Iterable[SageClass]', modules: 'Iterable[Module]') -> 'GraphCore':
+        """
+        Numbers `classes` and `modules`, plus any class only reached through a dependency,
+        and compresses the dependency lists of the classes, which are released afterwards.
+        """
+        graph = cls(cls._number_classes(classes), list(modules))
+        graph._attach()
+        return graph
+
+    def update(
+        self, classes: 'Iterable[SageClass]', modules: 'Iterable[Module]', replaced: 'Iterable[SageClass]'
+    ) -> 'GraphCore':
+        """
+        Returns the graph of `classes` and `modules` after some files changed. The out-edges
+        of the classes in `replaced` are read from their dependency lists, and the in-edges
+        from the dependent lists of every class, which only hold the links recorded since
+        this graph was built. Every other edge is copied from this graph, except the ones
+        of classes that are not in `classes` anymore.
+
+        The edges are copied as arrays, so the cost in Python only grows with the number of
+        classes and of replaced edges.
+        """
+        classes = self._number_classes(classes)
+        class_ids = {id(sage_class): i for i, sage_class in enumerate(classes)}
+        new_ids = np.array(
+            [class_ids.get(id(sage_class), -1) for sage_class in self.classes], dtype=np.int32
+        ).reshape(-1)
+        dropped = new_ids < 0
+        for sage_class in replaced:
+            if sage_class.graph is self:
+                dropped[sage_class.graph_id] = True
+
+        def kept_edges(indptr: np.ndarray, ends: np.ndarray, relations: np.ndarray, by_row: bool):
+            rows = np.repeat(np.arange(len(self.classes), dtype=np.int32), np.diff(indptr))
+            # Out-edges belong to their row, in-edges to the class at their other end
+            keep = ~dropped[rows if by_row else ends] & (new_ids[rows] >= 0) & (new_ids[ends] >= 0)
+            return new_ids[rows[keep]], new_ids[ends[keep]], relations[keep]
+
+        def concatenate(*edges):
+            return tuple(np.concatenate(arrays) for arrays in zip(*edges))
+
+        out_edges = concatenate(
+            kept_edges(self.out_indptr, self.out_targets, self.out_relations, True),
+            self._edge_arrays(
+                [sage_class._dependencies for sage_class in classes], lambda dep: class_ids[id(dep.target)]
+            )
+        )
+        in_edges = concatenate(
+            kept_edges(self.in_indptr, self.in_sources, self.in_relations, False),
+            self._edge_arrays(
+                [sage_class._dependents for sage_class in classes], lambda dep: class_ids[id(dep.source)]
+            )
+        )
+        graph = type(self)(classes, list(modules), out_edges, in_edges)
+        graph._attach()
+        return graph
+
+    @classmethod
+    def _number_classes(cls, classes: 'Iterable[SageClass]') -> 'List[SageClass]':
+        """
+        Returns `classes`, plus any class only reached through a dependency, in the order
+        of their IDs.
+        """
+        known = set()
+        classes = [
+            sage_class for sage_class in classes
+            if id(sage_class) not in known and not known.add(id(sage_class))
+        ]
+        for sage_class in list(classes):
+            for dep in sage_class._dependencies + sage_class._dependents:
+                for other in (dep.source, dep.target):
+                    if id(other) not in known:
+                        known.add(id(other))
+                        classes.append(other)
+
+        # Classes of the same package get consecutive IDs
+        classes.sort(key=lambda sage_class: cls._module_pre(sage_class.module))
+        return classes
+
+    def _attach(self):
+        """
+        Hands the dependencies of the classes, and the degrees of the modules, over to this graph.
+        """
+        for i, sage_class in enumerate(self.classes):
+            sage_class.set_graph(self, i)
+        for i, module in enumerate(self.modules):
+            if self.module_starts[i] >= 0:
+                module.set_graph(self, i)
+
+    @staticmethod
+    def _module_pre(module: 'Module') -> float:
+        interval = module.interval
+        return interval[0] if interval is not None else float("inf")
+
+    @staticmethod
+    def _edge_arrays(edge_lists: list, endpoint) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the row, endpoint and relation arrays of the edges in `edge_lists`.
+        """
+        sizes = [len(edges) for edges in edge_lists]
+        count = sum(sizes)
+        rows = np.repeat(np.arange(len(edge_lists), dtype=np.int32), sizes)
+        ends = np.fromiter(
+            (endpoint(dep) for edges in edge_lists for dep in edges), dtype=np.int32, count=count
+        )
+        relations = np.fromiter(
+            (dep.relation for edges in edge_lists for dep in edges), dtype=np.int8, count=count
+        )
+        return rows, ends, relations
+
+    def _compress(
+        self, num_rows: int, rows: np.ndarray, ends: np.ndarray, relations: np.ndarray
+    ) -> tuple[np.ndarray, ...]:
+        """
+        Returns the `indptr`, endpoint and relation arrays of the edges, with each row sorted
+        by decreasing relation (keeping the order of equal relations), and the start and size
+        of each bucket.
+        """
+        order = np.lexsort((-relations, rows))
+        rows, ends, relations = rows[order], ends[order], relations[order]
+        indptr = np.zeros(num_rows + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(rows, minlength=num_rows))
+
+        counts = np.zeros((num_rows, NUM_RELATIONS), dtype=np.int32)
+        np.add.at(counts, (rows, relations), 1)
+        # Stronger relations come first, so a bucket starts after every stronger bucket
+        stronger = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1] - counts
+        starts = indptr[:-1, None] + stronger
+        return indptr, ends, relations, starts, counts
+
+    def class_range(self, module: 'Module') -> tuple[int, int] | None:
+        """
+        Returns the range of IDs of the classes under `module`, or `None` if the module was
+        not numbered when the graph was built.
+        """
+        if module.graph is not self:
+            return None
+        return int(self.module_starts[module.graph_id]), int(self.module_ends[module.graph_id])
+
+    def _module_degree_list(self, direction: str, mask: int) -> list[int]:
+        degrees = self._module_degrees.get((direction, mask))
+        if degrees is None:
+            totals = self.out_totals if direction == "out" else self.in_totals
+            selected = [relation for relation in range(NUM_RELATIONS) if mask >> relation & 1]
+            class_totals = totals[:, selected].sum(axis=1)
+            starts = np.maximum(self.module_starts, 0)
+            ends = np.maximum(self.module_ends, 0)
+            degrees = (class_totals[ends] - class_totals[starts]).tolist()
+            self._module_degrees[(direction, mask)] = degrees
+        return degrees
+
+    def module_out_degree(self, module_id: int, relations: 'List[Relation] | int | None' = None) -> int:
+        """
+        Total out-degree of the classes under a module.
+        """
+        return self._module_degree_list("out", relation_mask(relations))[module_id]
+
+    def module_in_degree(self, module_id: int, relations: 'List[Relation] | int | None' = None) -> int:
+        """
+        Total in-degree of the classes under a module.
+        """
+        return self._module_degree_list("in", relation_mask(relations))[module_id]
+
+    @property
+    def inheritance(self) -> InheritanceClosure:
+        """
+        The ancestors and descendants of every class through inheritance, by class ID.
+        """
+        if self._inheritance is None:
+            mask = 1 << Relation.INHERITANCE
+            self._inheritance = InheritanceClosure(
+                [list(self.iter_successors(class_id, mask)) for class_id in range(self.num_classes)]
+            )
+        return self._inheritance
+
+    @property
+    def num_classes(self) -> int:
+        return len(self.classes)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.out_targets)
+
+    def _mask(self, relations: np.ndarray, selected: 'List[Relation] | int | None') -> 'np.ndarray | slice':
+        mask = relation_mask(selected)
+        if mask == ALL_RELATIONS:
+            return slice(None)
+        return ((1 << relations.astype(np.int64)) & mask) != 0
+
+    def _buckets(self, direction: str, class_id: int, mask: int) -> list[tuple[int, int, int]]:
+        """
+        Returns `(relation, start, end)` for each non-empty bucket of a class selected by
+        `mask`, in row order.
+        """
+        starts, counts, _ = self._bucket_lists[direction]
+        class_starts, class_counts = starts[class_id], counts[class_id]
+        return [
+            (relation, class_starts[relation], class_starts[relation] + class_counts[relation])
+            for relation in range(NUM_RELATIONS - 1, -1, -1)
+            if mask >> relation & 1 and class_counts[relation]
+        ]
+
+    def _neighbors(self, direction: str, class_id: int, relations: 'List[Relation] | int | None') -> np.ndarray:
+        ends = self.out_targets if direction == "out" else self.in_sources
+        mask = relation_mask(relations)
+        buckets = self._buckets(direction, class_id, mask)
+        if not buckets:
+            return ends[:0]
+        if len(buckets) == 1 or mask == ALL_RELATIONS:
+            # A single slice of the row, so a view rather than a copy
+            return ends[buckets[0][1]:buckets[-1][2]]
+        return np.concatenate([ends[start:end] for _, start, end in buckets])
+
+    def successors(self, class_id: int, relations: 'List[Relation] | int | None' = None) -> np.ndarray:
+        return self._neighbors("out", class_id, relations)
+
+    def predecessors(self, class_id: int, relations: 'List[Relation] | int | None' = None) -> np.ndarray:
+        return self._neighbors("in", class_id, relations)
+
+    def iter_successors(self, class_id: int, relations: 'List[Relation] | int | None' = None) -> 'Iterable[int]':
+        """
+        Yields the IDs of the successors of a class, without building an array.
+        """
+        targets = self._bucket_lists["out"][2]
+        for _, start, end in self._buckets("out", class_id, relation_mask(relations)):
+            for i in range(start, end):
+                yield targets[i]
+
+    def iter_predecessors(self, class_id: int, relations: 'List[Relation] | int | None' = None) -> 'Iterable[int]':
+        sources = self._bucket_lists["in"][2]
+        for _, start, end in self._buckets("in", class_id, relation_mask(relations)):
+            for i in range(start, end):
+                yield sources[i]
+
+    def _degree_list(self, direction: str, mask: int) -> list[int]:
+        degrees = self._degrees.get((direction, mask))
+        if degrees is None:
+            counts = self.out_counts if direction == "out" else self.in_counts
+            selected = [relation for relation in range(NUM_RELATIONS) if mask >> relation & 1]
+            degrees = counts[:, selected].sum(axis=1).tolist()
+            self._degrees[(direction, mask)] = degrees
+        return degrees
+
+    def out_degree(self, class_id: int, relations: 'List[Relation] | int | None' = None) -> int:
+        return self._degree_list("out", relation_mask(relations))[class_id]
+
+    def in_degree(self, class_id: int, relations: 'List[Relation] | int | None' = None) -> int:
+        return self._degree_list("in", relation_mask(relations))[class_id]
+
+    def out_degrees(self, relations: 'List[Relation] | int | None' = None) -> np.ndarray:
+        """
+        Out-degree of every class, indexed by class ID.
+        """
+        return np.array(self._degree_list("out", relation_mask(relations)))
+
+    def in_degrees(self, relations: 'List[Relation] | int | None' = None) -> np.ndarray:
+        """
+        In-degree of every class, indexed by class ID.
+        """
+        return np.array(self._degree_list("in", relation_mask(relations)))
+
+    def dependencies(self, class_id: int, relations: 'List[Relation] | int | None' = None) -> list[Dependency]:
+        source = self.classes[class_id]
+        _, _, targets = self._bucket_lists["out"]
+        return [
+            Dependency(source, self.classes[targets[i]], RELATIONS[relation])
+            for relation, start, end in self._buckets("out", class_id, relation_mask(relations))
+            for i in range(start, end)
+        ]
+
+    def dependents(self, class_id: int, relations: 'List[Relation] | int | None' = None) -> list[Dependency]:
+        target = self.classes[class_id]
+        _, _, sources = self._bucket_lists["in"]
+        return [
+            Dependency(self.classes[sources[i]], target, RELATIONS[relation])
+            for relation, start, end in self._buckets("in", class_id, relation_mask(relations))
+            for i in range(start, end)
+        ]
+
+    def module_quotient(
+        self, modules: 'List[Module]', relations: 'List[Relation] | int | None' = None
+    ) -> dict[tuple[int, int], list[int]]:
+        """
+        Collapses the class graph onto `modules`: there is an edge from `modules[i]` to
+        `modules[j]` when a class under the first depends on a class under the second. Each
+        edge comes with its number of class edges per relation. A class under several of the
+        modules (when they are nested) counts for each of them, and edges from a module to
+        itself are left out.
+
+        Done in one pass over the class edges, with the classes under each module taken from
+        its ID range. Modules added after the graph was built have no range and no edges.
+        """
+        member_classes, member_modules = [], []
+        for position, module in enumerate(modules):
+            class_range = self.class_range(module)
+            if class_range is not None and class_range[1] > class_range[0]:
+                member_classes.append(np.arange(*class_range))
+                member_modules.append(np.full(class_range[1] - class_range[0], position))
+        if not member_classes:
+            return {}
+        member_classes = np.concatenate(member_classes)
+        member_modules = np.concatenate(member_modules)
+        order = np.argsort(member_classes, kind="stable")
+        member_classes, member_modules = member_classes[order], member_modules[order]
+        # The modules containing class `c` are `member_modules[member_ptr[c]:member_ptr[c + 1]]`
+        member_ptr = np.searchsorted(member_classes, np.arange(self.num_classes + 1))
+        member_counts = np.diff(member_ptr)
+
+        def expand(edges: np.ndarray, classes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+            # Repeats each edge once per module containing its endpoint in `classes`
+            counts = member_counts[classes]
+            repeated = np.repeat(edges, counts)
+            offsets = np.arange(len(repeated)) - np.repeat(np.cumsum(counts) - counts, counts)
+            return repeated, member_modules[np.repeat(member_ptr[classes], counts) + offsets]
+
+        sources = np.repeat(np.arange(self.num_classes), np.diff(self.out_indptr))
+        edges = np.arange(self.num_edges)[self._mask(self.out_relations, relations)]
+        edges, source_modules = expand(edges, sources[edges])
+        pairs, target_modules = expand(np.arange(len(edges)), self.out_targets[edges])
+        source_modules = source_modules[pairs]
+        edge_relations = self.out_relations[edges[pairs]].astype(np.int64)
+
+        keep = source_modules != target_modules
+        keys = (source_modules[keep] * len(modules) + target_modules[keep]) * NUM_RELATIONS + edge_relations[keep]
+        keys, counts = np.unique(keys, return_counts=True)
+
+        quotient = {}
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            pair, relation = divmod(key, NUM_RELATIONS)
+            edge = quotient.setdefault(divmod(pair, len(modules)), [0] * NUM_RELATIONS)
+            edge[relation] = count
+        return quotient
+
+    def adjacency(
+        self, class_ids: 'List[int | None] | None' = None, relations: 'List[Relation] | None' = None,
+        weights: dict | None = None
+    ):
+        """
+        Returns the out-edges between `class_ids` (every class by default), in that order, as
+        a `scipy.sparse.csr_matrix`. A `None` ID stands for a class without edges.
+
+        A pair of classes gets one entry however many relations link them: 1, or the largest
+        of `weights[relation]` over these relations if `weights` is given, rather than their
+        sum. Zero entries are left out.
+        """
+        from scipy import sparse
+
+        if class_ids is None:
+            class_ids = range(self.num_classes)
+        positions = np.full(self.num_classes, -1, dtype=np.int64)
+        for position, class_id in enumerate(class_ids):
+            if class_id is not None:
+                positions[class_id] = position
+
+        sources = np.repeat(np.arange(self.num_classes, dtype=np.int32), np.diff(self.out_indptr))
+        rows = positions[sources]
+        columns = positions[self.out_targets]
+        mask = (rows >= 0) & (columns >= 0)
+        if relations is not None:
+            mask &= self._mask(self.out_relations, relations)
+
+        if weights is None:
+            values = np.ones(np.count_nonzero(mask))
+        else:
+            lookup = np.zeros(max(max(weights), int(self.out_relations.max(initial=0))) + 1)
+            for relation, weight in weights.items():
+                lookup[relation] = weight
+            values = lookup[self.out_relations[mask]]
+
+        # Keep the largest value of each pair, as `csr_matrix` would add them up
+        rows, columns = rows[mask], columns[mask]
+        order = np.lexsort((-values, columns, rows))
+        rows, columns, values = rows[order], columns[order], values[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (columns[1:] != columns[:-1])
+        first &= values != 0
+
+        return sparse.csr_matrix(
+            (values[first], (rows[first], columns[first])), shape=(len(class_ids), len(class_ids))
+        )
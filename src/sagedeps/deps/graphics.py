@@ -1,7 +1,7 @@
 from typing import List
 
 from sagedeps.deps.data import Data
-from sagedeps.deps.filter import Filter, PathFilter, MinDepthFilter
+from sagedeps.deps.filter import Filter, EmptyFilter, PathFilter, MinDepthFilter
 from sagedeps.deps.model.dependency import Dependency, Relation
 from sagedeps.deps.model.module import Module, File
 from sagedeps.deps.model.sageclass import SageClass
@@ -41,26 +41,52 @@ def create_class_digraph():
     
     return G
 
-def create_module_digraph(filter: Filter, relations: List[Relation]):
+def create_module_digraph(
+    filter: Filter = EmptyFilter(),
+    relations: List[Relation] | None = None,
+    depth: int | None = None,
+    path: str | None = None
+):
+    """
+    Generates the module dependency graph: an edge from a module to another one means that
+    a class under the first depends on a class under the second, through one of `relations`
+    (any relation by default). Edges are weighted by the number of class dependencies, and
+    carry those numbers per relation in `counts`.
+
+    If `depth` is given, the graph is the package level graph at that depth: every module
+    of that depth, and every file above it, stands for everything under it. Only modules
+    under `path` and passing `filter` are kept.
+    """
     G = nx.DiGraph()
     modules = Data.get_modules_filtered(filter)
-    print(f"Number of modules: {len(modules)}")
+    if path is not None:
+        modules = [
+            module for module in modules
+            if module.full_path_name == path or module.full_path_name.startswith(path + ".")
+        ]
+    if depth is not None:
+        modules = [
+            module for module in modules
+            if module.depth == depth or (module.depth < depth and isinstance(module, File))
+        ]
     
     module: Module
     for module in modules:
-        path = module.parent.full_path_name if module.parent is not None else ""
+        parent_path = module.parent.full_path_name if module.parent is not None else ""
         G.add_node(
             hash(module),
-            label=module.full_path_name.removeprefix(path),
+            label=module.full_path_name.removeprefix(parent_path),
             color=random_color()
         )
 
-    for module in modules:
-        for other in modules:
-            if module == other:
-                continue
-            if module.depends_on(other, relations=relations):
-                G.add_edge(hash(module), hash(other))
+    quotient = Data.graph.module_quotient(modules, relations) if Data.graph is not None else {}
+    for (source, target), counts in quotient.items():
+        G.add_edge(
+            hash(modules[source]),
+            hash(modules[target]),
+            weight=sum(counts),
+            counts={Relation(relation).name: count for relation, count in enumerate(counts) if count}
+        )
     
     return G
 
@@ -78,10 +104,11 @@ def create_graph_json(
     }
 
     classes = Data.get_classes_filtered(filter)
+    # Membership is tested for every node and edge, so it goes through sets of `id()`
+    class_ids = {id(sage_class) for sage_class in classes}
     modules = Data.get_modules_filtered(filter)
-    modules = [m for m in modules if any(c in m.get_classes() for c in classes)]
-    print(len(classes))
-    print(len(modules))
+    modules = [m for m in modules if any(id(c) in class_ids for c in m.get_classes())]
+    module_ids = {id(module) for module in modules}
 
     module: Module
     for module in modules:
@@ -91,7 +118,7 @@ def create_graph_json(
             "type": "file" if isinstance(module, File) else "module",
             "score": module.get_score
         }
-        if module.parent is not None and module.parent in modules:
+        if module.parent is not None and id(module.parent) in module_ids:
             data["parent"] = module.parent.full_path_name
         result["elements"]["nodes"].append({
             "data": data,
@@ -106,7 +133,7 @@ def create_graph_json(
             "type": "class",
             "score": sage_class.get_score
         }
-        if sage_class.module in modules:
+        if id(sage_class.module) in module_ids:
             data["parent"] = sage_class.module.full_path_name
         
         data["urls"] = Loader.get_doc_urls(sage_class)
@@ -120,7 +147,7 @@ def create_graph_json(
 
         dep: Dependency
         for dep in sage_class.get_dependencies():
-            if dep.target == sage_class or dep.target not in classes:
+            if dep.target is sage_class or id(dep.target) not in class_ids:
                 continue
             result["elements"]["edges"].append(
                 {
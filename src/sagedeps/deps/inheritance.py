@@ -0,0 +1,187 @@
+from typing import TYPE_CHECKING, Iterable, List
+if TYPE_CHECKING:
+    from sagedeps.deps.model.sageclass import SageClass
+
+import numpy as np
+
+from sagedeps.deps.model.dependency import Relation
+
+
+class InheritanceClosure:
+    """
+    The transitive closure of the inheritance relation over classes numbered `0..n - 1`,
+    given the direct base classes of each one.
+
+    The classes are grouped into strongly connected components, so inheritance cycles
+    (which the parser can produce through shadowed names) are collapsed, and the components
+    are visited in topological order, bases first. The ancestors of a component are then
+    the union of its bases and of their own ancestors, computed once. Sets of classes are
+    bitsets stored as Python integers, with bit `i` set for class `i`, so a union is one `|`
+    and a subclass test is one shift. Classes of the same component share their bitset.
+
+    The descendants are computed the same way, in the reverse order, the first time they are
+    asked for. Lists of IDs are built from the bitsets on demand and memoized.
+
+    A class is never its own ancestor, unless it lies on an inheritance cycle.
+    """
+    def __init__(self, bases: List[List[int]]):
+        self.bases = bases
+        self.component, self.components = self._strongly_connected_components(bases)
+        self._ancestors = self._close(self.components, bases)
+        self._descendants = None
+        self._ancestor_ids = {}
+        self._descendant_ids = {}
+
+    @classmethod
+    def from_classes(cls, classes: 'Iterable[SageClass]') -> 'InheritanceClosure':
+        """
+        Builds the closure from the inheritance dependencies recorded by `classes`, before
+        they are handed over to a `GraphCore`. Base classes outside of `classes` are numbered
+        after them, and the numbering is kept in `classes`.
+        """
+        classes = list(classes)
+        class_ids = {id(sage_class): i for i, sage_class in enumerate(classes)}
+        bases = []
+        i = 0
+        while i < len(classes):
+            class_bases = []
+            for dep in classes[i]._dependencies:
+                if dep.relation != Relation.INHERITANCE:
+                    continue
+                base_id = class_ids.get(id(dep.target))
+                if base_id is None:
+                    base_id = class_ids[id(dep.target)] = len(classes)
+                    classes.append(dep.target)
+                class_bases.append(base_id)
+            bases.append(class_bases)
+            i += 1
+        closure = cls(bases)
+        closure.classes = classes
+        return closure
+
+    @staticmethod
+    def _strongly_connected_components(bases: List[List[int]]) -> tuple[list[int], list[list[int]]]:
+        """
+        Iterative Tarjan. Returns the component of each class and the components, which come
+        out with every base component before the components inheriting from it.
+        """
+        n = len(bases)
+        index = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        component = [-1] * n
+        components = []
+        stack = []
+        counter = 0
+        for root in range(n):
+            if index[root] >= 0:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            pending = [(root, iter(bases[root]))]
+            while pending:
+                node, children = pending[-1]
+                for child in children:
+                    if index[child] < 0:
+                        index[child] = low[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack[child] = True
+                        pending.append((child, iter(bases[child])))
+                        break
+                    if on_stack[child] and index[child] < low[node]:
+                        low[node] = index[child]
+                else:
+                    pending.pop()
+                    if pending:
+                        parent = pending[-1][0]
+                        if low[node] < low[parent]:
+                            low[parent] = low[node]
+                    if low[node] == index[node]:
+                        members = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            component[member] = len(components)
+                            members.append(member)
+                            if member == node:
+                                break
+                        components.append(members)
+        return component, components
+
+    def _close(self, order: 'Iterable[list[int]]', edges: List[List[int]]) -> list[int]:
+        """
+        Returns the bitset of the classes reachable through `edges` from each component,
+        given the components in an order where every edge points to an earlier component.
+        """
+        component = self.component
+        reachable = [0] * len(self.components)
+        for members in order:
+            c = component[members[0]]
+            bits = 0
+            for member in members:
+                for other in edges[member]:
+                    other_component = component[other]
+                    if other_component != c:
+                        bits |= (1 << other) | reachable[other_component]
+            if len(members) > 1:
+                for member in members:
+                    bits |= 1 << member
+            reachable[c] = bits
+        return reachable
+
+    def _get_descendants(self) -> list[int]:
+        if self._descendants is None:
+            subclasses = [[] for _ in self.bases]
+            for class_id, class_bases in enumerate(self.bases):
+                for base_id in class_bases:
+                    subclasses[base_id].append(class_id)
+            self._descendants = self._close(reversed(self.components), subclasses)
+        return self._descendants
+
+    def _ids(self, bits: int) -> list[int]:
+        if not bits:
+            return []
+        packed = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(packed, bitorder="little")).tolist()
+
+    def ancestors(self, class_id: int) -> int:
+        """
+        Returns the bitset of the classes `class_id` inherits from, directly or not.
+        """
+        return self._ancestors[self.component[class_id]]
+
+    def descendants(self, class_id: int) -> int:
+        """
+        Returns the bitset of the classes inheriting from `class_id`, directly or not.
+        """
+        return self._get_descendants()[self.component[class_id]]
+
+    def ancestor_ids(self, class_id: int) -> list[int]:
+        component = self.component[class_id]
+        ids = self._ancestor_ids.get(component)
+        if ids is None:
+            ids = self._ancestor_ids[component] = self._ids(self._ancestors[component])
+        return ids
+
+    def descendant_ids(self, class_id: int) -> list[int]:
+        component = self.component[class_id]
+        ids = self._descendant_ids.get(component)
+        if ids is None:
+            ids = self._descendant_ids[component] = self._ids(self._get_descendants()[component])
+        return ids
+
+    def is_subclass(self, class_id: int, base_id: int) -> bool:
+        """
+        Whether `class_id` inherits from `base_id`, directly or not.
+        """
+        return self._ancestors[self.component[class_id]] >> base_id & 1 == 1
+
+    @property
+    def cycles(self) -> list[list[int]]:
+        """
+        The components with more than one class, which are inheritance cycles.
+        """
+        return [members for members in self.components if len(members) > 1]
@@ -0,0 +1,110 @@
+import re
+from typing import Iterable, Iterator, NamedTuple
+
+
+class LogicalLine(NamedTuple):
+    lineno: int     # first physical line of the logical line
+    indent: int     # indentation of the first physical line
+    code: str       # code with comments removed, strings replaced by "" and continuations joined
+
+
+class CythonLexer:
+    """
+    Streaming lexer for Cython (.pyx and .pxd) sources. Groups physical lines into
+    logical lines the way the Python tokenizer does: lines are joined inside brackets,
+    inside triple-quoted strings and after a trailing backslash.
+
+    Comments are dropped and every string literal, including docstrings, is replaced by
+    an empty `""`, so each logical line can be classified once with plain patterns
+    without mistaking text in strings or comments for code. Blank and comment-only
+    lines are skipped.
+    """
+    TOKEN = re.compile(r"""(?:(?<!\w)[rRbBuUfFcC]{1,2})?(\"\"\"|'''|"|')|(#)""")
+    STRING_END = {
+        '"""': re.compile(r'(?:[^"\\]|\\.|"(?!""))*"""', re.DOTALL),
+        "'''": re.compile(r"(?:[^'\\]|\\.|'(?!''))*'''", re.DOTALL),
+        '"': re.compile(r'(?:[^"\\\n]|\\.)*"'),
+        "'": re.compile(r"(?:[^'\\\n]|\\.)*'"),
+    }
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = lines
+
+    def __iter__(self) -> Iterator[LogicalLine]:
+        parts = []
+        depth = 0
+        string_delim = None
+        start = indent = 0
+
+        for lineno, line in enumerate(self._lines, 1):
+            if string_delim is not None and len(string_delim) == 3 and string_delim not in line:
+                # Fast path: the line is inside a docstring or another long string
+                continue
+            line = line.rstrip("\r\n")
+            if not parts and string_delim is None:
+                stripped = line.lstrip(" \t\f")
+                if not stripped:
+                    continue
+                start, indent = lineno, len(line) - len(stripped)
+
+            if string_delim is None and "#" not in line and '"' not in line and "'" not in line:
+                # Fast path: no strings or comments to remove
+                code = line
+            else:
+                string_delim, code = self._strip_line(line, string_delim)
+
+            depth = max(0, depth + code.count("(") + code.count("[") + code.count("{")
+                        - code.count(")") - code.count("]") - code.count("}"))
+            parts.append(code)
+
+            if string_delim is not None:
+                continue
+            code = "".join(parts).rstrip()
+            if code.endswith("\\"):
+                parts = [code[:-1], " "]
+                continue
+            if depth > 0:
+                parts = [code, " "]
+                continue
+
+            parts = []
+            if code:
+                yield LogicalLine(start, indent, code.lstrip())
+
+        code = "".join(parts).strip()
+        if code:
+            yield LogicalLine(start, indent, code)
+
+    def _strip_line(self, line: str, string_delim: str | None) -> 'tuple[str | None, str]':
+        """
+        Removes comments from a physical line and replaces its strings by "". Returns the
+        delimiter of the string still open at the end of the line, if any, and the code.
+        """
+        code = []
+        pos, end = 0, len(line)
+        while pos < end:
+            if string_delim is not None:
+                match = self.STRING_END[string_delim].match(line, pos)
+                if match is None:
+                    # Single-quoted strings only continue after a trailing backslash
+                    if len(string_delim) == 1 and not line.endswith("\\"):
+                        string_delim = None
+                        code.append('""')
+                    break
+                pos = match.end()
+                string_delim = None
+                code.append('""')
+                continue
+
+            match = self.TOKEN.search(line, pos)
+            if match is None:
+                code.append(line[pos:])
+                break
+            code.append(line[pos:match.start()])
+            pos = match.end()
+            if match.group(1):
+                string_delim = match.group(1)
+            else:
+                break
+
+        return string_delim, "".join(code)
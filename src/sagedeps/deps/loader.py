@@ -1,5 +1,8 @@
 import json
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterable
 
 from sagedeps.constants import Settings
 from sagedeps.deps.model.dependency import Dependency, Relation
@@ -7,6 +10,11 @@ from sagedeps.deps.model.importable import Importable
 from sagedeps.deps.model.module import File, Module
 from sagedeps.deps.model.sageclass import SageClass, PythonClass, CythonClass
 from sagedeps.deps.data import Data
+from sagedeps.deps.graph import GraphCore
+from sagedeps.deps.inheritance import InheritanceClosure
+from sagedeps.deps.parser import Parser
+from sagedeps.deps.snapshot import Snapshot, code_fingerprint, directory_fingerprint, file_fingerprint, package_version
+from sagedeps.deps.store import MemoryStore, ModuleStore, open_store
 
 
 class Loader:
@@ -16,90 +24,443 @@ class Loader:
     resources/. `Loader.initialize()` must be called before performing any dependency
     analysis (including cytoscape graph generation). 
     """
+    _store: 'ModuleStore | None' = None
+    _packages = None
+    _loaded_packages = set()
+    _imports_loaded = set()
+    _scorer = None
+    _completed_stages = set()
+    _inherit_dependencies = False
+
+    # Each stage is a method building part of `Data`, along with the stages it needs first.
+    # Stages are only run when something asks for their data, see `require`.
+    STAGES = {
+        "sources": ("load_sources", []),
+        "commit_metadata": ("load_commit_metadata", []),
+        "docs": ("parse_rst_content", []),
+        "scores": ("run_scorer", ["sources"]),
+    }
+
     @classmethod
-    def initialize(cls, scorer = None):
+    def initialize(
+        cls,
+        scorer = None,
+        packages = None,
+        store: 'ModuleStore | None' = None,
+        snapshot: 'Snapshot | None' = None,
+        inherit_dependencies: bool = False
+    ):
         """
         Initialize all data structures and scores each `SageClass` and `Module`.
+
+        Only the modules, classes, dependencies and scores are built here. Commit metadata and
+        the documentation index are loaded the first time something reads them from `Data`.
+
+        If `packages` is given (for example `["sage.rings", "sage.combinat"]`), only the
+        modules of those packages are fully loaded. Modules of other packages are loaded
+        the first time one of them is imported, and only as import targets: their own
+        imports and dependencies are not computed.
+
+        If `inherit_dependencies`, each class also depends on everything its ancestors
+        depend on.
+
+        If a `Snapshot` is given, the whole state is restored from it when none of the inputs
+        (module store, commit metadata, documentation, configuration, scope and scorer)
+        changed since it was saved. Otherwise it is rebuilt and the snapshot is updated.
+        """
+        Data.clear()
+        cls.set_store(store if store is not None else open_store(Settings.MODULE_JSON_SRC), packages)
+        cls._scorer = scorer
+        cls._completed_stages = set()
+        cls._inherit_dependencies = inherit_dependencies
+        Data.set_provider("commit_metadata", lambda: cls.require("commit_metadata"))
+        Data.set_provider("rst_index", lambda: cls.require("docs"))
+
+        fingerprint = cls.fingerprint(scorer, snapshot.saved_fingerprint()) if snapshot is not None else None
+        if fingerprint is not None:
+            saved = snapshot.load(fingerprint)
+            if saved is not None:
+                cls._loaded_packages = saved["loaded_packages"]
+                cls._imports_loaded = saved["imports_loaded"]
+                cls._completed_stages = saved["stages"]
+                return
+
+        cls.require("sources", "scores")
+
+        if fingerprint is not None:
+            snapshot.save(fingerprint, {
+                "loaded_packages": cls._loaded_packages,
+                "imports_loaded": cls._imports_loaded,
+                "stages": cls._completed_stages
+            })
+
+    @classmethod
+    def require(cls, *stages: str):
+        """
+        Runs the given stages, and the stages they depend on, unless they already ran.
+        """
+        pending = [(stage, False) for stage in reversed(stages)]
+        while pending:
+            stage, ready = pending.pop()
+            if stage in cls._completed_stages:
+                continue
+            method, dependencies = cls.STAGES[stage]
+            if ready:
+                getattr(cls, method)()
+                cls._completed_stages.add(stage)
+                continue
+            pending.append((stage, True))
+            pending.extend((dependency, False) for dependency in reversed(dependencies))
+
+    @classmethod
+    def run_scorer(cls):
+        if cls._scorer:
+            cls._scorer.run()
+
+    @classmethod
+    def fingerprint(cls, scorer = None, previous: dict | None = None) -> dict | None:
+        """
+        Identifies the inputs of `initialize` and the code that builds the state from them,
+        or returns `None` if the module store is not backed by files. The documentation tree
+        is only walked again if one of its directories changed since `previous`.
+        """
+        store_files = cls._store.source_files()
+        if not store_files:
+            return None
+        return {
+            "sagedeps": package_version(),
+            "parser": Parser.VERSION,
+            "code": code_fingerprint(),
+            "store": [file_fingerprint(path) for path in store_files],
+            "commit_metadata": file_fingerprint(Settings.COMMIT_METADATA),
+            "docs": directory_fingerprint(Settings.LOCAL_DOC_ROOT, (previous or {}).get("docs")),
+            "config": file_fingerprint(Settings._config_file),
+            "packages": cls._packages,
+            "inherit_dependencies": cls._inherit_dependencies,
+            "scorer": type(scorer).__name__ if scorer else None
+        }
+
+    @classmethod
+    def reload(cls, store: ModuleStore, scorer = None):
+        """
+        Rebuilds every module, class and dependency from `store`, for example after some
+        files were re-parsed, keeping the loaded scope, commit metadata and documentation.
         """
-        cls.load_all_modules()
-        cls.load_all_classes()
-        cls.load_all_instantiations()
-        cls.build_import_relations()
+        Data.clear()
+        cls.set_store(store, cls._packages)
+        cls._scorer = scorer
+        cls._completed_stages -= {"sources", "scores"}
+        cls.require("sources", "scores")
+
+    @classmethod
+    def update(cls, modules_dict: dict, previous: dict, updated: 'Iterable[str]', scorer = None):
+        """
+        Applies the changes of some modules to the loaded graph, without rebuilding the rest.
+        `modules_dict` is the whole module map after the change, `updated` the names of the
+        modules that were added, changed or removed, and `previous` their entries before the
+        change (if they had one).
+
+        The files of the updated modules are rebuilt, keeping the `SageClass` objects of the
+        classes that are still defined. Then the imports of these files and of every file
+        importing from them are added again, and the dependencies are recomputed for those
+        files and for the files star-importing any of them, directly or not. Every other
+        edge is copied from the previous `GraphCore`, see `GraphCore.update`.
+
+        With a scope or with inherited dependencies, a change can reach classes that are not
+        tracked here, so the graph is rebuilt with `reload` instead.
+        """
+        cls._store = MemoryStore(modules_dict)
+        cls._scorer = scorer
+        if cls._packages is not None or cls._inherit_dependencies or Data.graph is None:
+            cls.reload(cls._store, scorer)
+            return
+
+        updated = list(updated)
+        for module_name in updated:
+            for instantiation in (previous.get(module_name) or {}).get("instantiations", []):
+                Data.remove_reference(module_name + "." + instantiation["name"])
+
+        removed_classes = set()
+        for module_name in updated:
+            module = Data.get_module(module_name)
+            module_dict = modules_dict.get(module_name)
+            if isinstance(module, File) and (module_dict is None or module_dict["extension"] != module.extension):
+                removed_classes.update(id(sage_class) for sage_class in module.get_classes())
+                cls.remove_file(module)
+
+        changed_dict = {name: modules_dict[name] for name in updated if name in modules_dict}
+        cls.add_modules({name: module_dict for name, module_dict in changed_dict.items() if Data.get_module(name) is None})
+        for module_name, module_dict in changed_dict.items():
+            removed_classes.update(cls.update_classes(Data.get_module(module_name), module_dict))
+        Module.number_tree([Data.get_module("sage")])
+        cls.add_instantiations(changed_dict)
+        Data.finalize_references()
+
+        # Files whose imports may resolve differently, then files seeing their names
+        updated_names = set(updated)
+        importers = set(changed_dict)
+        star_importers = {}
+        for module_name, module_dict in modules_dict.items():
+            import_dicts = module_dict["imports"] + [
+                import_dict for class_dict in module_dict["classes"] for import_dict in class_dict["imports"]
+            ]
+            for import_dict in import_dicts:
+                if import_dict["full_module_path"] in updated_names:
+                    importers.add(module_name)
+                if import_dict["classes_imported"] == "*":
+                    star_importers.setdefault(import_dict["full_module_path"], set()).add(module_name)
+
+        importers = {
+            module_name for module_name in importers if isinstance(Data.get_module(module_name), File)
+        }
+        for module_name in importers:
+            module = Data.get_module(module_name)
+            module.clear_imports()
+            for sage_class in module.get_classes():
+                sage_class.clear_imports()
+            cls.add_module_imports(module, modules_dict[module_name])
+        Importable.invalidate_import_maps()
+
+        affected = set(importers)
+        pending = list(importers)
+        while pending:
+            for module_name in star_importers.get(pending.pop(), ()):
+                if module_name not in affected and isinstance(Data.get_module(module_name), File):
+                    affected.add(module_name)
+                    pending.append(module_name)
+
+        replaced = []
+        for module_name in affected:
+            module = Data.get_module(module_name)
+            cls.add_module_dependencies(module, modules_dict[module_name])
+            replaced.extend(module.get_classes())
+        for sage_class in replaced:
+            sage_class.get_filter_dependencies()
+
+        for sage_class in Data.classes.values():
+            sage_class.clear_interfaces()
         cls.add_interfaces()
-        cls.create_dependencies()
-        cls.load_commit_metadata()
-        cls.parse_rst_content()
-        if scorer:
-            scorer.run()
+
+        graph = Data.graph
+        classes = list(Data.classes.values()) + [
+            sage_class for sage_class in graph.classes if id(sage_class) not in removed_classes
+        ]
+        Data.set_graph(graph.update(classes, Data.modules.values(), replaced))
+
+        # Scores are added up from zero
+        for importable in [*Data.graph.classes, *Data.modules.values()]:
+            importable.set_score(0)
+        cls.run_scorer()
+
+    @classmethod
+    def remove_file(cls, file: File):
+        """
+        Removes a file and its classes, and the packages left empty above it.
+        """
+        for sage_class in file.get_classes():
+            Data.remove_class(sage_class.full_path_name, sage_class)
+        module = file
+        while module.parent is not None and not module.has_children:
+            module.parent.remove_child(module)
+            Data.remove_module(module.full_path_name)
+            module = module.parent
+
+    @classmethod
+    def update_classes(cls, file: File, module_dict: dict) -> 'set[int]':
+        """
+        Replaces the classes of a file with the ones of `module_dict`, keeping the objects of
+        the classes that are still defined so that other files can keep importing them.
+        Returns the `id()` of the classes that were removed.
+        """
+        py_cls = PythonClass if module_dict["extension"] == ".py" else CythonClass
+        previous_classes = {}
+        for sage_class in file.get_classes():
+            previous_classes.setdefault(sage_class.name, []).append(sage_class)
+            Data.remove_class(sage_class.full_path_name, sage_class)
+
+        classes = []
+        for class_dict in module_dict["classes"]:
+            candidates = previous_classes.get(class_dict["classname"])
+            if candidates and type(candidates[0]) is py_cls:
+                sage_class = candidates.pop(0)
+                sage_class.clear_imports()
+            else:
+                sage_class = py_cls(file, class_dict["classname"])
+            classes.append(sage_class)
+            Data.add_class(sage_class.full_path_name, sage_class)
+        file.set_classes(classes)
+        return {id(sage_class) for candidates in previous_classes.values() for sage_class in candidates}
+
+    @classmethod
+    def set_store(cls, store: ModuleStore, packages = None):
+        cls._store = store
+        if packages is None:
+            cls._packages = None
+            cls._loaded_packages = set(cls._store.packages())
+        else:
+            cls._packages = list(dict.fromkeys(
+                package for path in packages for package in cls._store.packages_for(path)
+            ))
+            cls._loaded_packages = set(cls._packages)
+        cls._imports_loaded = set()
+
+    @classmethod
+    def load_sources(cls):
+        """
+        Builds the modules, classes and dependencies of the module map. The module map is
+        read from the store once and handed to every stage.
+        """
+        modules_dict = cls.read_modules()
+        cls.load_all_modules(modules_dict)
+        cls.load_all_classes(modules_dict)
+        cls.load_all_instantiations(modules_dict)
+        Data.finalize_references()
+        cls.build_import_relations(modules_dict)
+        cls.add_interfaces()
+        cls.create_dependencies(modules_dict)
+
+    @classmethod
+    def read_modules(cls) -> dict:
+        """
+        Returns the module map of the packages being loaded.
+        """
+        return cls._store.read(cls._packages)
+
+    @classmethod
+    def get_loaded_files(cls) -> 'list[File]':
+        """
+        Returns the loaded files, leaving out files of packages that were only loaded as import targets.
+        """
+        return [
+            module for module_name, module in Data.modules.items()
+            if isinstance(module, File)
+            and (cls._packages is None or cls._store.package_of(module_name) in cls._packages)
+        ]
+
+    @classmethod
+    def load_package(cls, package: str) -> bool:
+        """
+        Loads the modules, classes and instantiations of a package that is outside of the
+        loaded scope, so they can be used as import targets. Returns `False` if the package
+        was already loaded.
+        """
+        if package in cls._loaded_packages:
+            return False
+        cls._loaded_packages.add(package)
+        modules_dict = cls._store.read([package])
+        cls.add_modules(modules_dict)
+        Module.number_tree([Data.get_module("sage")])
+        cls.add_classes(modules_dict)
+        cls.add_instantiations(modules_dict)
+        Data.finalize_references()
+        return True
+
+    @classmethod
+    def load_package_imports(cls, file: File):
+        """
+        Builds the top-level imports of a file outside of the loaded scope. This is needed
+        when a loaded file star-imports it, since its import map is then re-exported.
+        """
+        if cls._packages is None or file.full_path_name in cls._imports_loaded:
+            return
+        package = cls._store.package_of(file.full_path_name)
+        if package in cls._packages:
+            return
+        cls._imports_loaded.add(file.full_path_name)
+        module_dict = cls._store.read([package]).get(file.full_path_name)
+        if module_dict is not None:
+            cls.add_imports(file, module_dict["imports"])
+            Importable.invalidate_import_maps()
 
     @classmethod
-    def load_all_modules(cls):
+    def get_module(cls, full_module_name: str) -> 'Module | None':
+        """
+        Gets a module, loading its package first if it is outside of the loaded scope.
+        """
+        module = Data.get_module(full_module_name)
+        if module is None and cls._packages is not None:
+            package = cls._store.package_of_module(full_module_name)
+            if package is not None and cls.load_package(package):
+                module = Data.get_module(full_module_name)
+        return module
+
+    @classmethod
+    def load_all_modules(cls, modules_dict: dict | None = None):
         """Creates `Module` objects for every module found in `modules.json`.
         Loads in their name, path, and file extension for files.
         """
         base_module = Module("sage", None)
         Data.add_module("sage", base_module)
-        with open(Settings.MODULE_JSON_SRC, "r") as f:
-            modules_dict = json.loads(f.read())
-            for module_name in modules_dict.keys():
-                submodule_names = module_name.split(".")[1:]
-                parent_module = base_module
-                for submodule_name in submodule_names[:-1]:
-                    submodule = Data.get_module(
-                        parent_module.full_path_name + "." + submodule_name)
-                    if submodule is None:
-                        submodule = Module(submodule_name, parent_module)
-                        parent_module.add_child(submodule)
-                    Data.add_module(submodule.full_path_name, submodule)
-                    parent_module = submodule
-                
-                file_name = submodule_names[-1]
-                file = File(file_name, parent_module, modules_dict[module_name]["extension"])
-                parent_module.add_child(file)
-                Data.add_module(file.full_path_name, file)
+        cls.add_modules(modules_dict if modules_dict is not None else cls.read_modules())
+        Module.number_tree([base_module])
+
+    @classmethod
+    def add_modules(cls, modules_dict: dict):
+        base_module = Data.get_module("sage")
+        for module_name in modules_dict.keys():
+            submodule_names = module_name.split(".")[1:]
+            parent_module = base_module
+            for submodule_name in submodule_names[:-1]:
+                submodule = Data.get_module(
+                    parent_module.full_path_name + "." + submodule_name)
+                if submodule is None:
+                    submodule = Module(submodule_name, parent_module)
+                    parent_module.add_child(submodule)
+                Data.add_module(submodule.full_path_name, submodule)
+                parent_module = submodule
+            
+            file_name = submodule_names[-1]
+            file = File(file_name, parent_module, modules_dict[module_name]["extension"])
+            parent_module.add_child(file)
+            Data.add_module(file.full_path_name, file)
     
     @classmethod
-    def load_all_classes(cls):
+    def load_all_classes(cls, modules_dict: dict | None = None):
         """
         Creates `SageClass` objects for every class found in `modules.json`.
         Loads in their name, path, and parent module.
         """
-        with open(Settings.MODULE_JSON_SRC) as f:
-            modules_dict = json.loads(f.read())
-            for module_name in modules_dict.keys():
-                py_cls = PythonClass if modules_dict[module_name]["extension"] == ".py" else CythonClass
-                classes = modules_dict[module_name]["classes"]
-                parent_module = Data.get_module(module_name)
-                if parent_module is None or not isinstance(parent_module, File):
-                    print(f"Parent module {module_name} not found")
-                    continue
-                for classdict in classes:
-                    classname = classdict["classname"]
-                    sage_class = py_cls(parent_module, classname)
-                    parent_module.add_class(sage_class)
-                    Data.add_class(sage_class.full_path_name, sage_class)
+        cls.add_classes(modules_dict if modules_dict is not None else cls.read_modules())
+
+    @classmethod
+    def add_classes(cls, modules_dict: dict):
+        for module_name in modules_dict.keys():
+            py_cls = PythonClass if modules_dict[module_name]["extension"] == ".py" else CythonClass
+            classes = modules_dict[module_name]["classes"]
+            parent_module = Data.get_module(module_name)
+            if parent_module is None or not isinstance(parent_module, File):
+                print(f"Parent module {module_name} not found")
+                continue
+            for classdict in classes:
+                classname = classdict["classname"]
+                sage_class = py_cls(parent_module, classname)
+                parent_module.add_class(sage_class)
+                Data.add_class(sage_class.full_path_name, sage_class)
+        Importable.invalidate_import_maps()
 
     @classmethod
-    def load_all_instantiations(cls):
+    def load_all_instantiations(cls, modules_dict: dict | None = None):
         """
         Loads all run-time class instantiations that occur at the top level. This is 
         often used for Singleton classes like `ZZ = IntegerRing_class` or classes with
         aliases. The `Data` class will resolve aliases.
         """
-        with open(Settings.MODULE_JSON_SRC) as f:
-            modules_dict = json.loads(f.read())
-            for module_name in modules_dict.keys():
-                instantiations = modules_dict[module_name]["instantiations"]
-                for instantiation in instantiations:
-                    full_path_name = module_name + "." + instantiation["name"]
-                    referenced_name = module_name + "." + instantiation["func_name"]
-                    if instantiation["type"] == "alias":
-                        Data.add_alias(full_path_name, referenced_name)
-                    else:
-                        Data.add_instantiation(full_path_name, referenced_name)
+        cls.add_instantiations(modules_dict if modules_dict is not None else cls.read_modules())
+
+    @classmethod
+    def add_instantiations(cls, modules_dict: dict):
+        for module_name in modules_dict.keys():
+            instantiations = modules_dict[module_name]["instantiations"]
+            for instantiation in instantiations:
+                full_path_name = module_name + "." + instantiation["name"]
+                referenced_name = module_name + "." + instantiation["func_name"]
+                if instantiation["type"] == "alias":
+                    Data.add_alias(full_path_name, referenced_name)
+                else:
+                    Data.add_instantiation(full_path_name, referenced_name)
 
     @classmethod
-    def build_import_relations(cls):
+    def build_import_relations(cls, modules_dict: dict | None = None):
         """
         Creates import maps for every `Importable` objects. This includes
         `Module` and `SageClass` objects.
@@ -115,27 +476,33 @@ class Loader:
         method. Otherwise, it will only store `from` imports and explicit
         imports.
         """
-        with open(Settings.MODULE_JSON_SRC) as f:
-            modules_dict = json.loads(f.read())
-            for module_name in modules_dict.keys():
-                module = Data.get_module(module_name)
-                if module is None or not isinstance(module, File):
-                    print(f"Cannot find module {module_name}")
-                    continue
-
-                module_dict = modules_dict[module_name]
-                top_level_imports = module_dict["imports"]
-                cls.add_imports(module, top_level_imports)
+        if modules_dict is None:
+            modules_dict = cls.read_modules()
+        for module_name in modules_dict.keys():
+            module = Data.get_module(module_name)
+            if module is None or not isinstance(module, File):
+                print(f"Cannot find module {module_name}")
+                continue
+            cls.add_module_imports(module, modules_dict[module_name])
+        Importable.invalidate_import_maps()
 
-                defined_classes = module_dict["classes"]
-                for class_dict in defined_classes:
-                    full_class_path = module_name + "." + class_dict["classname"]
-                    sage_class = Data.get_class(full_class_path)
-                    if sage_class is None or not isinstance(sage_class, SageClass):
-                        print(f"Cannot find class {full_class_path}")
-                        continue
-                    class_level_imports = class_dict["imports"]
-                    cls.add_imports(sage_class, class_level_imports)
+    @classmethod
+    def add_module_imports(cls, module: File, module_dict: dict):
+        """
+        Adds the top level imports of a file and the class level imports of its classes.
+        """
+        top_level_imports = module_dict["imports"]
+        cls.add_imports(module, top_level_imports)
+
+        defined_classes = module_dict["classes"]
+        for class_dict in defined_classes:
+            full_class_path = module.full_path_name + "." + class_dict["classname"]
+            sage_class = Data.get_class(full_class_path)
+            if sage_class is None or not isinstance(sage_class, SageClass):
+                print(f"Cannot find class {full_class_path}")
+                continue
+            class_level_imports = class_dict["imports"]
+            cls.add_imports(sage_class, class_level_imports)
 
     @classmethod
     def add_imports(cls, object: Importable, import_dicts: dict):
@@ -145,15 +512,21 @@ class Loader:
         as a class or file import respectively.
         """
         for import_dict in import_dicts:
-            imported_module = Data.get_module(import_dict["full_module_path"])
+            imported_module = cls.get_module(import_dict["full_module_path"])
             if imported_module is not None and isinstance(imported_module, File):
                 if import_dict["type"] in ["from-import", "from-cimport", "lazy-import"]:
                     if import_dict["classes_imported"] == "*":
                         object.add_full_import(imported_module)
+                        # The names of a star-imported file include its own imports, which
+                        # are not built for files of packages only loaded as import targets
+                        cls.load_package_imports(imported_module)
                         continue
-                    for alias, classname in import_dict["classes_imported"].items():
-                        full_class_path = import_dict["full_module_path"] + "." + classname
-                        imported_class = Data.get_class(full_class_path)
+                    imported_names = import_dict["classes_imported"]
+                    resolved_paths = Data.resolve_references(
+                        import_dict["full_module_path"] + "." + classname for classname in imported_names.values()
+                    )
+                    for alias, resolved_path in zip(imported_names, resolved_paths):
+                        imported_class = Data.classes.get(resolved_path)
                         if imported_class is not None and isinstance(imported_class, SageClass):
                             object.add_class_import(alias, imported_class)
                 else:
@@ -177,7 +550,7 @@ class Loader:
                 sage_class.add_interface(m2_repr)
 
     @classmethod
-    def create_dependencies(cls):
+    def create_dependencies(cls, modules_dict: dict | None = None):
         """
         Add all dependency relations between classes. Note that the `SageClass`
         itself will resolve all dependencies and take only that of highest priority.
@@ -194,89 +567,116 @@ class Loader:
         This is found in `modules.json` under 'attributes' and 'symbols'.
 
         """
-        with open(Settings.MODULE_JSON_SRC) as f:
-            modules_dict = json.loads(f.read())
-            for module_name in modules_dict.keys():
-                module = Data.get_module(module_name)
-                if module is None or not isinstance(module, File):
-                    print(f"Cannot find module {module_name}")
-                    continue
+        if modules_dict is None:
+            modules_dict = cls.read_modules()
+        for module_name in modules_dict.keys():
+            module = Data.get_module(module_name)
+            if module is None or not isinstance(module, File):
+                print(f"Cannot find module {module_name}")
+                continue
+            cls.add_module_dependencies(module, modules_dict[module_name])
 
-                module_dict = modules_dict[module_name]
+        if cls._inherit_dependencies:
+            cls.inherit_dependencies()
 
-                defined_classes = module_dict["classes"]
-                for class_dict in defined_classes:
-                    full_class_path = module_name + "." + class_dict["classname"]
-                    sage_class = Data.get_class(full_class_path)
-                    if sage_class is None or not isinstance(sage_class, SageClass):
-                        print(f"Cannot find class {full_class_path}")
-                        continue
+        sage_class: SageClass
+        for sage_class in Data.classes.values():
+            sage_class.get_filter_dependencies()
 
-                    symbols = class_dict["symbols"]
-                    
-                    import_map, file_import_map = sage_class.get_import_map(split_level=True)
-                    for alias, imported_class in import_map.items():
-                        sage_class.add_dependency(
-                            Dependency(
-                                source = sage_class,
-                                target = imported_class,
-                                relation = Relation.SUB_METHOD_IMPORT
-                            )
-                        )
-                        if any([symbol == alias for symbol in symbols]):
-                            sage_class.add_dependency(
-                            Dependency(
-                                source = sage_class,
-                                target = imported_class,
-                                relation = Relation.DECLARED_SUB_IMPORT
-                            )
-                        )
+        Data.set_graph(GraphCore.build(Data.classes.values(), Data.modules.values()))
 
-                    for alias, imported_class in file_import_map.items():
-                        sage_class.add_dependency(
-                            Dependency(
-                                source = sage_class,
-                                target = imported_class,
-                                relation = Relation.TOP_LEVEL_IMPORT
-                            )
+    @classmethod
+    def add_module_dependencies(cls, module: File, module_dict: dict):
+        """
+        Adds the dependencies of the classes of a file, see `create_dependencies`.
+        """
+        module_name = module.full_path_name
+        defined_classes = module_dict["classes"]
+        for class_dict in defined_classes:
+            full_class_path = module_name + "." + class_dict["classname"]
+            sage_class = Data.get_class(full_class_path)
+            if sage_class is None or not isinstance(sage_class, SageClass):
+                print(f"Cannot find class {full_class_path}")
+                continue
+
+            # Hashed once, so each alias is matched in constant time
+            symbols = set(class_dict["symbols"])
+                
+            import_map, file_import_map = sage_class.get_import_map(split_level=True)
+            for alias, imported_class in import_map.items():
+                sage_class.add_dependency(
+                    Dependency(
+                        source = sage_class,
+                        target = imported_class,
+                        relation = Relation.SUB_METHOD_IMPORT
+                    )
+                )
+                if alias in symbols:
+                    sage_class.add_dependency(
+                    Dependency(
+                        source = sage_class,
+                        target = imported_class,
+                        relation = Relation.DECLARED_SUB_IMPORT
+                    )
+                )
+
+            for alias, imported_class in file_import_map.items():
+                sage_class.add_dependency(
+                    Dependency(
+                        source = sage_class,
+                        target = imported_class,
+                        relation = Relation.TOP_LEVEL_IMPORT
+                    )
+                )
+                if alias in symbols:
+                    sage_class.add_dependency(
+                    Dependency(
+                        source = sage_class,
+                        target = imported_class,
+                        relation = Relation.DECLARED_TOP_IMPORT
+                    )
+                )
+                
+            # Top level imports shadow class level ones here
+            full_import_map = ChainMap(file_import_map, import_map)
+
+            for inherited_class_name in class_dict["inherited"]:
+                inherited_class = full_import_map.get(inherited_class_name)
+                if inherited_class is not None:
+                    sage_class.add_dependency(
+                        Dependency(
+                            source = sage_class,
+                            target = inherited_class,
+                            relation = Relation.INHERITANCE
                         )
-                        if any([symbol == alias for symbol in symbols]):
-                            sage_class.add_dependency(
-                            Dependency(
-                                source = sage_class,
-                                target = imported_class,
-                                relation = Relation.DECLARED_TOP_IMPORT
-                            )
+                    )
+                
+            for attribute_name in class_dict["attributes"]:
+                attribute_class = full_import_map.get(attribute_name)
+                if attribute_class is not None:
+                    sage_class.add_dependency(
+                        Dependency(
+                            source = sage_class,
+                            target = attribute_class,
+                            relation = Relation.CLASS_ATTRIBUTE
                         )
-                    
-                    full_import_map = import_map
-                    full_import_map.update(file_import_map)
-
-                    for inherited_class_name in class_dict["inherited"]:
-                        inherited_class = full_import_map.get(inherited_class_name)
-                        if inherited_class is not None:
-                            sage_class.add_dependency(
-                                Dependency(
-                                    source = sage_class,
-                                    target = inherited_class,
-                                    relation = Relation.INHERITANCE
-                                )
-                            )
-                    
-                    for attribute_name in class_dict["attributes"]:
-                        attribute_class = full_import_map.get(attribute_name)
-                        if attribute_class is not None:
-                            sage_class.add_dependency(
-                                Dependency(
-                                    source = sage_class,
-                                    target = attribute_class,
-                                    relation = Relation.CLASS_ATTRIBUTE
-                                )
-                            )
-        
-        sage_class: SageClass
-        for sage_class in Data.classes.values():
-            sage_class.get_filter_dependencies()
+                    )
+
+    @classmethod
+    def inherit_dependencies(cls):
+        """
+        Adds the dependencies of every ancestor of a class to the class. The ancestors come
+        from an `InheritanceClosure`, so each class only reads the dependency lists of its
+        ancestors, as they were before any of them were extended, and cycles are harmless.
+        """
+        closure = InheritanceClosure.from_classes(Data.classes.values())
+        for members in closure.cycles:
+            print(f"Inheritance cycle between: {', '.join(closure.classes[i].full_path_name for i in members)}")
+        own_dependencies = [list(sage_class._dependencies) for sage_class in closure.classes]
+        for class_id, sage_class in enumerate(closure.classes):
+            ancestor_ids = closure.ancestor_ids(class_id)
+            if ancestor_ids:
+                sage_class.get_filter_dependencies(own_dependencies[i] for i in ancestor_ids)
 
     @classmethod
     def load_commit_metadata(cls):
@@ -295,16 +695,21 @@ class Loader:
         Data.set_commit_metadata(commit_metadata)
 
     @classmethod
-    def collect_all_rst_files(cls, section_path):
+    def scan_rst_section(cls, section_path: Path) -> set[str]:
         """
-        Recursively collect all .rst files included in this reference section. These tell us
-        which base path to find the documentation page for a particular class.
+        Collects the module paths (e.g. `sage/rings/integer_ring`) documented by a reference
+        section. These tell us which base path to find the documentation page for a
+        particular class.
+
+        The .rst files of the section are followed from its index.rst through the toctree
+        includes, and the module paths are taken from each file's own path, its
+        `.. automodule::` and `.. module::` directives and its toctree entries.
 
         Typically used as a subroutine of `parse_rst_content`.
         """
         visited = set()
-        pending = ["index.rst"]
-        all_rst_paths = []
+        pending = [Path("index.rst")]
+        module_paths = set()
 
         while pending:
             rel_path = pending.pop()
@@ -312,39 +717,60 @@ class Loader:
             if rst_path in visited or not rst_path.exists():
                 continue
             visited.add(rst_path)
-            all_rst_paths.append(rst_path)
+            if rel_path != Path("index.rst"):
+                module_paths.add(rel_path.with_suffix("").as_posix())
 
-            # Scan for nested toctree includes
+            # Scan for module directives and nested toctree includes
+            in_toctree = False
             with rst_path.open() as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith("..") or line.startswith(":"):
+                for raw_line in f:
+                    line = raw_line.strip()
+                    if not line:
+                        continue
+                    if line.startswith(".."):
+                        directive, _, argument = line[2:].partition("::")
+                        directive = directive.strip()
+                        in_toctree = directive == "toctree"
+                        if directive in ("automodule", "module", "currentmodule") and argument.strip():
+                            module_paths.add(argument.strip().replace(".", "/"))
                         continue
+                    if in_toctree and not raw_line[0].isspace():
+                        in_toctree = False
+                    if line.startswith(":"):
+                        continue
+                    if in_toctree:
+                        # Entries can be titled, as in `Title <path>`
+                        if line.endswith(">") and "<" in line:
+                            line = line[line.rindex("<") + 1:-1]
+                        module_paths.add(line.removesuffix(".rst"))
                     if not line.endswith(".rst"):
                         line += ".rst"
                     candidate = (section_path / line).resolve()
                     if candidate.exists():
-                        pending.append(candidate.relative_to(section_path))
+                        pending.append(candidate.relative_to(section_path.resolve()))
 
-        return all_rst_paths
+        return module_paths
     
     @classmethod
     def parse_rst_content(cls):
         """
-        Parses content of each .rist file.
+        Builds the index of documented module paths to the reference sections documenting
+        them. Sections are scanned in parallel since this is mostly waiting on file reads.
         """
-        result = {}
-        for section in Path(Settings.LOCAL_DOC_ROOT).iterdir():
-            index = section / "index.rst"
-            if not index.exists():
-                continue
-            result[section.name] = ""
-            rst_files = cls.collect_all_rst_files(section)
-            for rst_file in rst_files:
-                content = rst_file.read_text()
-                result[section.name] += "\n" + content
+        doc_root = Path(Settings.LOCAL_DOC_ROOT)
+        sections = []
+        if doc_root.is_dir():
+            sections = sorted(
+                section for section in doc_root.iterdir() if (section / "index.rst").exists()
+            )
+
+        index = {}
+        with ThreadPoolExecutor() as executor:
+            for section, module_paths in zip(sections, executor.map(cls.scan_rst_section, sections)):
+                for module_path in module_paths:
+                    index.setdefault(module_path, []).append(section.name)
         
-        Data.set_rst_content(result)
+        Data.set_rst_index(index)
 
     @classmethod
     def get_doc_urls(cls, sage_class: SageClass):
@@ -377,33 +803,25 @@ class Loader:
         }
         """
         result = {}
-        with open(Settings.MODULE_JSON_SRC) as f:
-            modules_dict = json.loads(f.read())
-            for module_name in modules_dict.keys():
-                module = Data.get_module(module_name)
-                if module is None or not isinstance(module, File):
-                    print(f"Cannot find module {module_name}")
+        for module in cls.get_loaded_files():
+            for defined_class in module.get_classes():
+                full_class_path = defined_class.full_path_name
+                sage_class = Data.get_class(full_class_path)
+                if sage_class is None or not isinstance(sage_class, SageClass):
+                    print(f"Cannot find class {full_class_path}")
                     continue
-                module_dict = modules_dict[module_name]
-                defined_classes = module_dict["classes"]
-                for class_dict in defined_classes:
-                    full_class_path = module_name + "." + class_dict["classname"]
-                    sage_class = Data.get_class(full_class_path)
-                    if sage_class is None or not isinstance(sage_class, SageClass):
-                        print(f"Cannot find class {full_class_path}")
-                        continue
 
-                    if split:
-                        sub_import_map, top_import_map = sage_class.get_import_map(split_level=True)
-                        sub_import_map = {key:value.full_path_name for key, value in sub_import_map.items()}
-                        top_import_map = {key:value.full_path_name for key, value in top_import_map.items()}
-                        result[full_class_path] = {
-                            "class-imports": sub_import_map,
-                            "top-level-imports": top_import_map
-                        }
-                    else:
-                        import_map = {key:value.full_path_name for key, value in sage_class.get_import_map().items()}
-                        result[full_class_path] = import_map
+                if split:
+                    sub_import_map, top_import_map = sage_class.get_import_map(split_level=True)
+                    sub_import_map = {key:value.full_path_name for key, value in sub_import_map.items()}
+                    top_import_map = {key:value.full_path_name for key, value in top_import_map.items()}
+                    result[full_class_path] = {
+                        "class-imports": sub_import_map,
+                        "top-level-imports": top_import_map
+                    }
+                else:
+                    import_map = {key:value.full_path_name for key, value in sage_class.get_import_map().items()}
+                    result[full_class_path] = import_map
         
         return result
     
@@ -1,8 +1,9 @@
-from typing import TYPE_CHECKING
+from enum import IntEnum
+from typing import TYPE_CHECKING, Iterable, NamedTuple
 if TYPE_CHECKING:
     from sagedeps.deps.model.sageclass import SageClass
 
-class Relation:
+class Relation(IntEnum):
     NOTHING = -1
     SUB_METHOD_IMPORT = 0
     TOP_LEVEL_IMPORT = 1
@@ -11,13 +12,25 @@ class Relation:
     CLASS_ATTRIBUTE = 4
     INHERITANCE = 5
 
-class Dependency:
-    def __init__(
-            self,
-            source: 'SageClass',
-            target: 'SageClass',
-            relation: Relation
-    ):
-        self.source = source
-        self.target = target
-        self.relation = relation
+class Dependency(NamedTuple):
+    source: 'SageClass'
+    target: 'SageClass'
+    relation: Relation
+
+# Bitmask with every relation set, see `relation_mask`
+ALL_RELATIONS = (1 << (max(Relation) + 1)) - 1
+
+def relation_mask(relations: 'Iterable[Relation] | int | None') -> int:
+    """
+    Encodes a set of relations as a bitmask with bit `relation` set for each of them.
+    `None` stands for every relation, and a mask is returned as it is.
+    """
+    if relations is None:
+        return ALL_RELATIONS
+    if type(relations) is int:
+        return relations
+    mask = 0
+    for relation in relations:
+        if relation >= 0:
+            mask |= 1 << relation
+    return mask
@@ -7,6 +7,21 @@ if TYPE_CHECKING:
     from typing import List
 
 class Importable:
+    __slots__ = ("_score",)
+
+    # The generation of the cached import maps. They depend on each other through star
+    # imports, so they are all invalidated together, see `invalidate_import_maps`
+    _import_generation = 0
+
+    @classmethod
+    def invalidate_import_maps(cls):
+        """
+        Invalidates every cached import map. Adding or removing imports or classes does not
+        do it, so whoever changes them calls this once the changes are done, before reading
+        an import map again. The `Loader` calls it once per loading stage.
+        """
+        Importable._import_generation += 1
+
     def add_file_import(self, alias: str, file: 'File'):
         raise NotImplementedError(f"{self.__class__.__name__} is an abstract base class.")
 
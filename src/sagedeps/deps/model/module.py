@@ -1,5 +1,7 @@
+import sys
 from typing import TYPE_CHECKING, List
 if TYPE_CHECKING:
+    from sagedeps.deps.graph import GraphCore
     from sagedeps.deps.model.dependency import Relation
     from sagedeps.deps.model.sageclass import SageClass
     from typing import List
@@ -7,13 +9,25 @@ if TYPE_CHECKING:
 from sagedeps.deps.model.importable import Importable
 
 class Module(Importable):
+    __slots__ = (
+        "_parent", "_name", "_full_name", "_children", "_depth", "_pre", "_post", "_graph", "_graph_id",
+        "_classes"
+    )
+
     def __init__(self, name: str, parent: 'Module | None'):
         self._parent = parent
-        self._name = name
-        self._full_name = parent.full_path_name + "." + name if not self.is_root else name
+        self._name = sys.intern(name)
+        self._full_name = sys.intern(parent.full_path_name + "." + name if not self.is_root else name)
         self._children = []
+        self._depth = parent._depth + 1 if parent is not None else 0
         self._score = 0
 
+        # Euler tour interval, see `number_tree`
+        self._pre = None
+        self._post = None
+        self._graph = None
+        self._graph_id = None
+
         # cached variables
         self._classes = None
 
@@ -39,19 +53,67 @@ class Module(Importable):
 
     @property
     def depth(self) -> int:
-        if self._parent is None:
-            return 0
-        return self._parent.depth + 1
+        return self._depth
+
+    @property
+    def interval(self) -> tuple[int, int] | None:
+        """
+        The `(pre, post)` Euler tour numbers of this module, or `None` if it was added
+        after the tree was numbered.
+        """
+        if self._pre is None:
+            return None
+        return self._pre, self._post
     
+    @property
+    def graph(self) -> 'GraphCore | None':
+        return self._graph
+
+    @property
+    def graph_id(self) -> int | None:
+        return self._graph_id
+
+    def set_graph(self, graph: 'GraphCore', graph_id: int):
+        """
+        Reads the degrees of this module from `graph`, where it has ID `graph_id`.
+        """
+        self._graph = graph
+        self._graph_id = graph_id
+
     def add_child(self, other: 'Module') -> None:
         self._children.append(other)
+        self._clear_class_cache()
+
+    def remove_child(self, other: 'Module') -> None:
+        self._children.remove(other)
+        self._clear_class_cache()
+
+    @property
+    def has_children(self) -> bool:
+        return len(self._children) > 0
+
+    def _clear_class_cache(self):
+        """
+        Drops the cached classes of this module and of the modules above it. A module's
+        classes are only cached after the ones of every module under it, so the walk stops
+        at the first module without a cache.
+        """
+        module = self
+        while module is not None and not isinstance(module, File) and module._classes is not None:
+            module._classes = None
+            module = module._parent
     
     def contained_in(self, other: 'Module | None') -> bool:
         if other is None:
             return False
-        if self._parent is None:
-            return False
-        return self._parent == other or self._parent.contained_in(other)
+        if self._pre is not None and isinstance(other, Module) and other._pre is not None:
+            return other._pre < self._pre and self._post < other._post
+        ancestor = self._parent
+        while ancestor is not None:
+            if ancestor == other:
+                return True
+            ancestor = ancestor._parent
+        return False
 
     def contains(self, other: 'Module'):
         return other.contained_in(self)
@@ -70,13 +132,44 @@ class Module(Importable):
         
         return False
     
-    def in_degree(self, relations: 'List[Relation] | None' = None) -> int:
+    @classmethod
+    def number_tree(cls, roots: 'List[Module]'):
+        """
+        Numbers the trees under `roots` with one counter, taken when a module is entered
+        (`pre`) and when it is left (`post`). A module is then inside another exactly when
+        its interval is nested in the other's, and the modules under a module are the ones
+        whose `pre` falls in its interval.
+        """
+        counter = 0
+        for root in roots:
+            pending = [(root, False)]
+            while pending:
+                module, done = pending.pop()
+                if done:
+                    module._post = counter
+                    counter += 1
+                    continue
+                module._pre = counter
+                counter += 1
+                pending.append((module, True))
+                pending.extend((child, False) for child in reversed(module._children))
+
+    def in_degree(self, relations: 'List[Relation] | int | None' = None) -> int:
+        if self._graph is not None:
+            return self._graph.module_in_degree(self._graph_id, relations)
         return sum([c.in_degree(relations) for c in self._children])
 
-    def out_degree(self, relations: 'List[Relation] | None' = None) -> int:
+    def out_degree(self, relations: 'List[Relation] | int | None' = None) -> int:
+        if self._graph is not None:
+            return self._graph.module_out_degree(self._graph_id, relations)
         return sum([c.out_degree(relations) for c in self._children])
 
 class File(Module):
+    __slots__ = (
+        "_extension", "_imported_files", "_imported_classes", "_full_imports", "_import_map",
+        "_import_map_generation"
+    )
+
     def __init__(self, name: str, parent: 'Module', extension: str):
         super().__init__(name, parent)
         self._extension = extension
@@ -85,18 +178,31 @@ class File(Module):
         self._imported_classes = {}
         self._full_imports = []
 
+        # cached variables
+        self._import_map = None
+        self._import_map_generation = -1
+
     @property
     def extension(self) -> str | None:
         return self._extension
     
-    def in_degree(self, relations: 'List[Relation] | None' = None) -> int:
+    def in_degree(self, relations: 'List[Relation] | int | None' = None) -> int:
+        if self._graph is not None:
+            return self._graph.module_in_degree(self._graph_id, relations)
         return sum([c.in_degree(relations) for c in self._classes])
 
-    def out_degree(self, relations: 'List[Relation] | None' = None) -> int:
+    def out_degree(self, relations: 'List[Relation] | int | None' = None) -> int:
+        if self._graph is not None:
+            return self._graph.module_out_degree(self._graph_id, relations)
         return sum([c.out_degree(relations) for c in self._classes])
     
     def add_class(self, sage_class: 'SageClass'):
         self._classes.append(sage_class)
+        self._parent._clear_class_cache()
+
+    def set_classes(self, classes: 'List[SageClass]'):
+        self._classes = list(classes)
+        self._parent._clear_class_cache()
     
     def get_classes(self):
         return self._classes
@@ -110,21 +216,16 @@ class File(Module):
     def add_full_import(self, file: 'File'):
         self._full_imports.append(file)
 
-    def get_import_map(self, visited: set | None = None) -> dict[str, Importable]:
-        if visited is None:
-            visited = set()
-        if self in visited:
-            return {}
-        visited.add(self)
-
-        import_map = {}
-        for file in self._full_imports:
-            import_map.update(file.get_import_map(visited))
-        
-        import_map.update(
-            self._imported_classes
-        )
+    def clear_imports(self):
+        self._imported_files = {}
+        self._imported_classes = {}
+        self._full_imports = []
 
+    def get_own_import_map(self) -> dict[str, Importable]:
+        """
+        Returns the names bound by the imports of this file, leaving out star imports.
+        """
+        import_map = dict(self._imported_classes)
         import_map.update(
             {
                 file_alias + "." + sage_class.name  : sage_class
@@ -132,8 +233,97 @@ class File(Module):
                 for sage_class in file.get_classes()
             }
         )
-
         return import_map
 
-        
+    def get_import_map(self) -> dict[str, Importable]:
+        """
+        Returns every name bound by the imports of this file, including the names re-exported
+        by star-imported files. The map is cached and shared, so it must not be modified.
+        """
+        if self._import_map_generation != Importable._import_generation:
+            File.resolve_import_maps([self])
+        return self._import_map
+
+    @classmethod
+    def resolve_import_maps(cls, files: 'List[File]'):
+        """
+        Computes the import maps of `files` and of every file they star-import. Star imports
+        form a graph that can have cycles, so it is split into strongly connected components
+        (with an iterative Tarjan's algorithm) which are resolved dependencies first.
+        """
+        generation = Importable._import_generation
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+
+        for root in files:
+            if root._import_map_generation == generation or root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(root._full_imports))]
+            while work:
+                file, imports = work[-1]
+                for imported_file in imports:
+                    if imported_file._import_map_generation == generation:
+                        continue
+                    if imported_file not in index:
+                        index[imported_file] = low[imported_file] = len(index)
+                        stack.append(imported_file)
+                        on_stack.add(imported_file)
+                        work.append((imported_file, iter(imported_file._full_imports)))
+                        break
+                    if imported_file in on_stack:
+                        low[file] = min(low[file], index[imported_file])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[file])
+                    if low[file] == index[file]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member is file:
+                                break
+                        cls._resolve_component(component, generation)
+
+    @classmethod
+    def _resolve_component(cls, component: 'List[File]', generation: int):
+        """
+        Sets the import maps of a strongly connected component of the star import graph, whose
+        star-imported files outside of the component are already resolved. A file gets the
+        maps of the files it star-imports, in order, with its own imports on top. Files in
+        a cycle re-export each other, so they all get every name bound in the cycle.
+        """
+        members = set(component)
+        partial_maps = {}
+        for file in reversed(component):
+            own_map = file.get_own_import_map()
+            external = [imported._import_map for imported in file._full_imports if imported not in members]
+            if len(external) == 1 and not own_map:
+                # Nothing to add, share the map of the star-imported file
+                partial_maps[file] = external[0]
+                continue
+            import_map = {}
+            for imported_map in external:
+                import_map.update(imported_map)
+            import_map.update(own_map)
+            partial_maps[file] = import_map
+
+        if len(component) == 1 and component[0] not in component[0]._full_imports:
+            file = component[0]
+            file._import_map = partial_maps[file]
+            file._import_map_generation = generation
+            return
 
+        cycle_map = {}
+        for file in reversed(component):
+            cycle_map.update(partial_maps[file])
+        for file in component:
+            file._import_map = cycle_map
+            file._import_map_generation = generation
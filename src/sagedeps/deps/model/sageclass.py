@@ -1,17 +1,26 @@
 import json
+import sys
+from collections import ChainMap
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
-    from sagedeps.deps.model.module import Module, File
-    from typing import List
+    from sagedeps.deps.graph import GraphCore
+    from typing import Iterable, List
 
-from sagedeps.deps.model.dependency import Dependency, Relation
+from sagedeps.deps.model.dependency import Dependency, Relation, relation_mask
 from sagedeps.deps.model.importable import Importable
+from sagedeps.deps.model.module import File, Module
 
 class Interface:
     MACAULAY2 = "m2"
     LIBSINGULAR = "singular"
 
 class SageClass(Importable):
+    __slots__ = (
+        "_name", "_full_name", "_module", "_is_abstract", "_is_cython", "_imported_files",
+        "_imported_classes", "_full_imports", "_dependencies", "_dependents", "_interface_type",
+        "_interfaces", "_graph", "_graph_id", "_import_maps", "_import_maps_generation"
+    )
+
     def __init__(
             self,
             module: 'File',
@@ -21,7 +30,9 @@ class SageClass(Importable):
             interface: Interface | None = None
 
     ):
-        self._name = classname
+        self._name = sys.intern(classname)
+        # Used as a key and compared everywhere, so it is built and interned once
+        self._full_name = sys.intern(module.full_path_name + "." + classname)
         self._module = module
         self._is_abstract = is_abstract
         self._is_cython = is_cython
@@ -33,6 +44,12 @@ class SageClass(Importable):
         self._score = 0
         self._interface_type = interface
         self._interfaces = []
+        self._graph = None
+        self._graph_id = None
+
+        # cached variables
+        self._import_maps = None
+        self._import_maps_generation = -1
 
     def add_dependency(self, dep: Dependency):
         if dep.target == self:
@@ -45,15 +62,32 @@ class SageClass(Importable):
             return
         self._dependents.append(dep)
 
-    def get_filter_dependencies(self):
+    @property
+    def graph(self) -> 'GraphCore | None':
+        return self._graph
+
+    @property
+    def graph_id(self) -> int | None:
+        return self._graph_id
+
+    def set_graph(self, graph: 'GraphCore', graph_id: int):
         """
-        Gets dependencies of inherited classes.
-        Only keep the strongest dependency link for a given target.
+        Hands the dependencies of this class over to `graph`, where it has ID `graph_id`.
         """
-        inherited_classes = [dep.target for dep in self._dependencies if dep.relation == Relation.INHERITANCE]
-        for inherited_class in inherited_classes:
-            continue
-            self._dependencies.extend(inherited_class.get_filter_dependencies())
+        self._graph = graph
+        self._graph_id = graph_id
+        self._dependencies = []
+        self._dependents = []
+
+    def get_filter_dependencies(self, inherited: 'Iterable[List[Dependency]]' = ()):
+        """
+        Adds the dependencies of inherited classes, given as the dependency lists of every
+        ancestor (see `InheritanceClosure`), then only keeps the strongest dependency link
+        for a given target.
+        """
+        for dependencies in inherited:
+            for dep in dependencies:
+                self.add_dependency(Dependency(self, dep.target, dep.relation))
 
         filtered_list = []
         classes = set()
@@ -71,26 +105,30 @@ class SageClass(Importable):
         self_dict = {
             "dependencies": {
                 "sub-level-import": [
-                    dep.target.full_path_name for dep in self._dependencies if dep.relation == Relation.SUB_METHOD_IMPORT
+                    dep.target.full_path_name for dep in self.get_dependencies([Relation.SUB_METHOD_IMPORT])
                 ],
                 "top-level-import": [
-                    dep.target.full_path_name for dep in self._dependencies if dep.relation == Relation.TOP_LEVEL_IMPORT
+                    dep.target.full_path_name for dep in self.get_dependencies([Relation.TOP_LEVEL_IMPORT])
                 ],
                 "attribute": [
-                    dep.target.full_path_name for dep in self._dependencies if dep.relation == Relation.CLASS_ATTRIBUTE
+                    dep.target.full_path_name for dep in self.get_dependencies([Relation.CLASS_ATTRIBUTE])
                 ],
                 "inheritance": [
-                    dep.target.full_path_name for dep in self._dependencies if dep.relation == Relation.INHERITANCE
+                    dep.target.full_path_name for dep in self.get_dependencies([Relation.INHERITANCE])
                 ],
             }
         }
 
         return self_dict
     
-    def in_degree(self, relations: 'List[Relation] | None' = None) -> int:
+    def in_degree(self, relations: 'List[Relation] | int | None' = None) -> int:
+        if self._graph is not None:
+            return self._graph.in_degree(self._graph_id, relations)
         return len(self.get_dependents(relations))
     
-    def out_degree(self, relations: 'List[Relation] | None' = None) -> int:
+    def out_degree(self, relations: 'List[Relation] | int | None' = None) -> int:
+        if self._graph is not None:
+            return self._graph.out_degree(self._graph_id, relations)
         return len(self.get_dependencies(relations))
 
     @property
@@ -103,7 +141,7 @@ class SageClass(Importable):
     
     @property
     def full_path_name(self) -> str:
-        return self.module.full_path_name + "." + self.name
+        return self._full_name
 
     @property
     def depth(self) -> int:
@@ -119,28 +157,87 @@ class SageClass(Importable):
     def get_interfaces(self) -> 'List[SageClass]':
         return self._interfaces
 
-    def get_dependencies(self, relations: 'List[Relation] | None' = None) -> list[Dependency]:
-        return [dep for dep in self._dependencies if relations is None or dep.relation in relations]
+    def clear_interfaces(self):
+        self._interfaces = []
+
+    def get_dependencies(self, relations: 'List[Relation] | int | None' = None) -> list[Dependency]:
+        if self._graph is not None:
+            return self._graph.dependencies(self._graph_id, relations)
+        mask = relation_mask(relations)
+        return [dep for dep in self._dependencies if mask >> dep.relation & 1]
 
-    def get_dependents(self, relations: 'List[Relation] | None' = None) -> list[Dependency]:
-        return [dep for dep in self._dependents if relations is None or dep.relation in relations]
+    def get_dependents(self, relations: 'List[Relation] | int | None' = None) -> list[Dependency]:
+        if self._graph is not None:
+            return self._graph.dependents(self._graph_id, relations)
+        mask = relation_mask(relations)
+        return [dep for dep in self._dependents if mask >> dep.relation & 1]
 
     def contained_in(self, other: 'Module'):
         return other == self._module or self._module.contained_in(other)
     
     def depends_on(self, other: 'SageClass | Module', relations=None):
-        from model.module import Module
+        if self._graph is not None and isinstance(other, Module):
+            class_range = self._graph.class_range(other)
+            if class_range is not None:
+                start, end = class_range
+                return any(start <= target < end for target in self._graph.iter_successors(self._graph_id, relations))
         if isinstance(other, SageClass):
-            return any([
-                d.target == other and (relations is None or d.relation in relations)
-                for d in self._dependencies
-            ])
+            return any([d.target == other for d in self.get_dependencies(relations)])
         elif isinstance(other, Module):
-            return any([
-                d.target.contained_in(other) and (relations is None or d.relation in relations)
-                for d in self._dependencies
-            ])
+            return any([d.target.contained_in(other) for d in self.get_dependencies(relations)])
     
+    def _get_inheritance(self, other: 'SageClass | None' = None):
+        if (
+            self._graph is not None
+            and (other is None or other._graph is self._graph)
+        ):
+            return self._graph.inheritance
+        return None
+
+    def get_ancestors(self) -> 'List[SageClass]':
+        """
+        Returns every class this class inherits from, directly or not.
+        """
+        inheritance = self._get_inheritance()
+        if inheritance is not None:
+            classes = self._graph.classes
+            return [classes[i] for i in inheritance.ancestor_ids(self._graph_id)]
+        ancestors = []
+        seen = set()
+        pending = [self]
+        while pending:
+            for dep in pending.pop().get_dependencies([Relation.INHERITANCE]):
+                if id(dep.target) not in seen:
+                    seen.add(id(dep.target))
+                    ancestors.append(dep.target)
+                    pending.append(dep.target)
+        return ancestors
+
+    def get_subclasses(self) -> 'List[SageClass]':
+        """
+        Returns every class inheriting from this class, directly or not.
+        """
+        inheritance = self._get_inheritance()
+        if inheritance is not None:
+            classes = self._graph.classes
+            return [classes[i] for i in inheritance.descendant_ids(self._graph_id)]
+        subclasses = []
+        seen = set()
+        pending = [self]
+        while pending:
+            for dep in pending.pop().get_dependents([Relation.INHERITANCE]):
+                if id(dep.source) not in seen:
+                    seen.add(id(dep.source))
+                    subclasses.append(dep.source)
+                    pending.append(dep.source)
+        return subclasses
+
+    def is_subclass_of(self, other: 'SageClass') -> bool:
+        inheritance = self._get_inheritance(other)
+        if inheritance is not None:
+            return inheritance.is_subclass(self._graph_id, other._graph_id)
+        return any(ancestor is other for ancestor in self.get_ancestors())
+
     def add_file_import(self, alias: str, file: 'File'):
         self._imported_files[alias] = file
 
@@ -150,16 +247,21 @@ class SageClass(Importable):
     def add_full_import(self, file: 'File'):
         self._full_imports.append(file)
 
-    def get_import_map(self, split_level=False) -> dict | tuple[dict, dict]:
+    def clear_imports(self):
+        self._imported_files = {}
+        self._imported_classes = {}
+        self._full_imports = []
+
+    def _get_cached_import_maps(self) -> tuple[ChainMap, ChainMap]:
         """
+        Builds the class level and top level import maps as views over the cached maps of the
+        files they come from, instead of copying them. Later maps in the chain are shadowed
+        by earlier ones, so star imports are chained last, the last one first.
         """
-        class_import_map = {}
-
-        for file in self._full_imports:
-            class_import_map.update(file.get_import_map())
+        if self._import_maps_generation == Importable._import_generation:
+            return self._import_maps
 
-        class_import_map.update(self._imported_classes)
-        
+        class_import_map = dict(self._imported_classes)
         class_import_map.update(
             {
                 file_alias + "." + sage_class.name  : sage_class
@@ -167,21 +269,34 @@ class SageClass(Importable):
                 for sage_class in file.get_classes()
             }
         )
-
-        top_level_import_map = self._module.get_import_map()
-        top_level_import_map.update(
-            {
-                sage_class.name : sage_class for sage_class in self._module.get_classes()
-            }
+        File.resolve_import_maps([self._module] + self._full_imports)
+        class_chain = ChainMap(
+            class_import_map, *[file.get_import_map() for file in reversed(self._full_imports)]
+        )
+        top_level_chain = ChainMap(
+            {sage_class.name : sage_class for sage_class in self._module.get_classes()},
+            self._module.get_import_map()
         )
 
-        if split_level:
-            return class_import_map, top_level_import_map
+        self._import_maps = (class_chain, top_level_chain)
+        self._import_maps_generation = Importable._import_generation
+        return self._import_maps
 
-        top_level_import_map.update(class_import_map)
-        return top_level_import_map
+    def get_import_map(self, split_level=False) -> ChainMap | tuple[ChainMap, ChainMap]:
+        """
+        Returns the names visible in the class, as `(class level, top level)` maps if
+        `split_level`, otherwise as one map where class level imports shadow top level ones.
+        The maps share their contents with the import maps of the files, so a new layer is
+        put on top of them and writes only ever go to that layer.
+        """
+        class_chain, top_level_chain = self._get_cached_import_maps()
+        if split_level:
+            return ChainMap({}, *class_chain.maps), ChainMap({}, *top_level_chain.maps)
+        return ChainMap({}, *class_chain.maps, *top_level_chain.maps)
 
 class PythonClass(SageClass):
+    __slots__ = ()
+
     def __init__(
             self,
             module: 'Module',
@@ -199,6 +314,8 @@ class PythonClass(SageClass):
         
 
 class CythonClass(SageClass):
+    __slots__ = ()
+
     def __init__(
             self,
             module: 'Module',
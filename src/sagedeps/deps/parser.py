@@ -1,18 +1,55 @@
+import functools
 import re
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, Iterable, List, NamedTuple
 
 from sagedeps.constants import Settings
+from sagedeps.deps.lexer import CythonLexer
 
 import ast
 
+if TYPE_CHECKING:
+    from sagedeps.deps.cache import ParseCache
+
+class ImportRecord(NamedTuple):
+    """
+    Structural form of an import statement, built from the AST rather than its source text.
+    """
+    type: str                               # import, from-import, cimport, from-cimport or lazy-import
+    module: str                             # imported module, without the leading dots of relative imports
+    level: int                              # number of leading dots of relative imports
+    names: 'tuple[tuple[str, str], ...] | str'  # (alias, name) pairs or "*", empty for import/cimport
+    alias: str | None                       # name bound to the module by import/cimport and lazy-import
+
+
 class Parser:
+    # Bump whenever the parser output changes, so stale `ParseCache` entries are discarded
+    VERSION = 4
+
+    CIMPORT_KEYWORD = re.compile(r"\bcimport\b")
+
+    # Classifies a logical line of a Cython file with a single match, see `parse_cython`
+    CYTHON_LINE = re.compile("|".join([
+        r"(?P<class>(?P<cdef>cdef\s+)?class\s+(?P<class_name>\w+))",
+        r"(?P<function>(?P<function_kind>cpdef|cdef|def)\s+(?:[\w.\[\], *&]+?\s+)?\**(?P<function_name>\w+)\s*\()",
+        r"(?P<import>(?:from\s+[\w.]+\s+)?(?:(?P<cimport>cimport)|import)\s+)",
+        r"(?P<attribute>self\.\w+\s*=\s*(?P<attribute_call>[\w.]+)\()",
+        r"(?P<instantiation>(?P<instance_name>\w+)\s*=\s*(?P<instance_call>[\w.]+)\s*\(.*\))",
+        r"(?P<alias>(?P<alias_name>\w+)\s*=\s*(?P<alias_target>[\w.]+)\s*$)",
+    ]))
+    CYTHON_INHERITANCE = re.compile(r"^\s*(cdef\s+)?class\s+(\w+)\s*\((.*?)\)\s*:")
+    CYTHON_TOKEN = re.compile(r"[a-zA-Z0-9._]+")
+
     USELESS_SYMBOLS = set([
         "__init__", "def", "class", "raise", "self", "return", "object", "if", "else", "elif", "not", "or", "and",
         "None", "cdef", "in", "__xor__", "__mul__", "Parent.__init__", "except", "try", "is"
     ])
 
+    # Number of import statements whose resolution is memoized, see `resolve_import_record`
+    RESOLVED_IMPORTS_CACHE_SIZE = 1 << 16
+
     @classmethod
     def pyfile_to_module(cls, path):
         # Convert file path to module name
@@ -22,376 +59,532 @@ class Parser:
         return ".".join(["sage"] + parts)
 
     @classmethod
-    def create_python_module_class_map(cls, python=True, cython=True, list_symbols=True):
+    def create_python_module_class_map(
+        cls, python=True, cython=True, list_symbols=True, workers=1, cache: 'ParseCache | None' = None,
+        prune_symbols=False
+    ):
         """
         Main function for generating the modules.json file. Walks through the SageMath codebase
         and parses each .py and .pyx file it finds to extract information about its classes
         and imports.
+
+        If `workers` is greater than 1, files are parsed in a pool of that many processes.
+        Results are merged back in walk order, so the output is identical to a serial run.
+
+        If a `ParseCache` is given, only files that were added or changed since the cache
+        was last saved are parsed. The cache is updated and saved before returning.
+
+        If `prune_symbols` is set, class symbols that can never match an import alias are
+        dropped, see `prune_module_symbols`.
         """
-        module_class_map = {}
+        tasks = []
         for dirpath, _, filenames in os.walk(Settings.SAGE_SRC):
             for filename in filenames:
-                full_path = os.path.join(dirpath, filename)
-                module_name = cls.pyfile_to_module(full_path)
-                if python and filename.endswith(".py"):
-                    parsed_python = cls.parse_python(full_path)
-                    module_class_map[module_name] = {}
-                    module_class_map[module_name]["classes"] = [
-                        { 
-                            "classname": c["name"],
-                            "imports": [
-                                cls.resolve_import(imp[1], module_name) for imp in c["imports"]
-                            ],
-                            "inherited": c["inherited"],
-                            "attributes": c["attributes"],
-                            "symbols": cls.strip_useless_symbols(c["symbols"] if list_symbols else [])
-                        } for c in parsed_python["classes"] 
-                    ]
-                    module_class_map[module_name]["imports"] =[
-                        cls.resolve_import(imp[1], module_name) for imp in parsed_python["imports"]
-                    ]
-                    module_class_map[module_name]["extension"] = ".py"
-                    module_class_map[module_name]["instantiations"] = parsed_python["instantiations"]
-
-                elif cython and filename.endswith(".pyx"):
-                    cython_header = full_path.strip(".pyx") + ".pxd"
-                    if Path(cython_header).is_file():
-                        parsed_cython = cls.parse_cython(full_path, cython_header)
-                    else:
-                        parsed_cython = cls.parse_cython(full_path)
-                    module_class_map[module_name] = {}
-                    module_class_map[module_name]["classes"] = [
-                        {
-                            "classname": c["name"],
-                            "imports": [
-                                cls.resolve_import(imp[1], module_name) for imp in c["imports"]
-                            ],
-                            "inherited": c["inherited"],
-                            "attributes": c["attributes"],
-                            "symbols": cls.strip_useless_symbols(c["symbols"] if list_symbols else [])
-                        } for c in parsed_cython["classes"] 
-                    ]
-                    module_class_map[module_name]["imports"] =[
-                        cls.resolve_import(imp[1], module_name) for imp in parsed_cython["imports"]
-                    ]
-                    module_class_map[module_name]["extension"] = ".pyx"
-                    module_class_map[module_name]["instantiations"] = parsed_cython["instantiations"]
+                if (python and filename.endswith(".py")) or (cython and filename.endswith(".pyx")):
+                    tasks.append(os.path.join(dirpath, filename))
+
+        entries = {}
+        pending = []
+        for full_path in tasks:
+            entry = cache.get(full_path, cls.get_sources(full_path)) if cache is not None else None
+            if entry is None:
+                pending.append(full_path)
+            else:
+                entries[full_path] = entry
+
+        # Cached entries always keep their symbols, they are only dropped when merging
+        parse_symbols = list_symbols or cache is not None
+        for full_path, entry in zip(pending, cls._parse_modules(pending, parse_symbols, workers)):
+            entries[full_path] = entry
+            if cache is not None:
+                cache.put(full_path, cls.get_sources(full_path), entry)
+
+        if cache is not None:
+            if python and cython:
+                cache.prune(tasks)
+            cache.save()
 
+        module_class_map = {}
+        for full_path in tasks:
+            entry = entries[full_path]
+            if not list_symbols and parse_symbols:
+                entry = dict(entry, classes=[dict(c, symbols=[]) for c in entry["classes"]])
+            elif prune_symbols:
+                entry = cls.prune_module_symbols(entry)
+            module_class_map[cls.pyfile_to_module(full_path)] = entry
 
         return module_class_map
 
+    @classmethod
+    def update_module_class_map(
+        cls, module_class_map: dict, changed, removed, list_symbols=True,
+        cache: 'ParseCache | None' = None, prune_symbols=False
+    ) -> List[str]:
+        """
+        Updates a map returned by `create_python_module_class_map` in place after the source
+        files in `changed` were added or modified and the ones in `removed` were deleted.
+        A changed or removed .pxd header re-parses its .pyx file. Returns the names of the
+        modules that were updated or removed.
+        """
+        to_parse, to_remove = set(), set()
+        for full_path in set(changed) | set(removed):
+            root, extension = os.path.splitext(full_path)
+            if extension == ".pxd":
+                full_path, extension = root + ".pyx", ".pyx"
+            if extension not in (".py", ".pyx"):
+                continue
+            if Path(full_path).is_file():
+                to_parse.add(full_path)
+            else:
+                to_remove.add(full_path)
+
+        updated = []
+        for full_path in sorted(to_remove):
+            module_name = cls.pyfile_to_module(full_path)
+            if module_class_map.pop(module_name, None) is not None:
+                updated.append(module_name)
+
+        for full_path in sorted(to_parse):
+            try:
+                entry = cls.parse_module(full_path, list_symbols or cache is not None)
+            except (OSError, SyntaxError, UnicodeDecodeError) as e:
+                print(f"Could not parse {full_path}: {e}")
+                continue
+            if cache is not None:
+                cache.put(full_path, cls.get_sources(full_path), entry)
+                if not list_symbols:
+                    entry = dict(entry, classes=[dict(c, symbols=[]) for c in entry["classes"]])
+            if list_symbols and prune_symbols:
+                entry = cls.prune_module_symbols(entry)
+            module_name = cls.pyfile_to_module(full_path)
+            module_class_map[module_name] = entry
+            updated.append(module_name)
+
+        return updated
+
+    @classmethod
+    def prune_module_symbols(cls, entry: dict) -> dict:
+        """
+        Returns a copy of a modules.json entry keeping only the class symbols that
+        `Loader.create_dependencies` can match against an import alias:
+
+        - names bound by `from` imports and lazy imports of the file or of the class,
+        - `<module alias>.<name>` for modules bound by `import` and `cimport`,
+        - names of the classes defined in the same file.
+
+        Names brought in by star imports are only known once the imported file is loaded,
+        so classes that see a star import keep all of their symbols.
+        """
+        def visible_aliases(imports):
+            names, module_aliases, star = set(), set(), False
+            for import_dict in imports:
+                if import_dict["classes_imported"] == "*":
+                    star = True
+                elif isinstance(import_dict["classes_imported"], dict):
+                    names.update(import_dict["classes_imported"])
+                if import_dict["type"] in ("import", "cimport") and import_dict["alias"] is not None:
+                    module_aliases.add(import_dict["alias"])
+            return names, module_aliases, star
+
+        file_names, file_module_aliases, file_star = visible_aliases(entry["imports"])
+        file_names.update(c["classname"] for c in entry["classes"])
+
+        classes = []
+        for class_dict in entry["classes"]:
+            names, module_aliases, star = visible_aliases(class_dict["imports"])
+            if not (file_star or star):
+                names |= file_names
+                module_aliases |= file_module_aliases
+                class_dict = dict(class_dict, symbols=[
+                    symbol for symbol in class_dict["symbols"]
+                    if symbol in names or symbol.rpartition(".")[0] in module_aliases
+                ])
+            classes.append(class_dict)
+        return dict(entry, classes=classes)
+
+    @classmethod
+    def _parse_modules(cls, paths: List[str], list_symbols: bool, workers: int):
+        """
+        Yields the parsed entry of each file in `paths`, in order.
+        """
+        if workers > 1 and len(paths) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, len(paths) // (workers * 8))
+                yield from executor.map(
+                    cls.parse_module, paths, [list_symbols] * len(paths), chunksize=chunksize
+                )
+        else:
+            for full_path in paths:
+                yield cls.parse_module(full_path, list_symbols)
+
+    @classmethod
+    def get_sources(cls, full_path: str) -> List[str]:
+        """
+        Returns the files read when parsing `full_path`. This is the file itself and,
+        for Cython, its .pxd header if there is one.
+        """
+        if full_path.endswith(".pyx"):
+            cython_header = os.path.splitext(full_path)[0] + ".pxd"
+            if Path(cython_header).is_file():
+                return [full_path, cython_header]
+        return [full_path]
+
+    @classmethod
+    def parse_module(cls, full_path: str, list_symbols=True):
+        """
+        Parses a single .py or .pyx file and returns its entry in the modules.json file.
+        """
+        sources = []
+        for source_path in cls.get_sources(full_path):
+            with open(source_path, "r", encoding="utf-8", errors="ignore") as f:
+                sources.append(f.read())
+        return cls.parse_module_source(
+            cls.pyfile_to_module(full_path), *sources, extension=os.path.splitext(full_path)[1],
+            list_symbols=list_symbols
+        )
+
+    @classmethod
+    def parse_module_source(
+        cls, module_name: str, source: str, cython_header: str | None = None, extension: str | None = None,
+        list_symbols=True
+    ):
+        """
+        Same as `parse_module`, from the source of the module rather than its path. The
+        `extension` of the module defaults to ".pyx" if a `cython_header` is given, ".py" otherwise.
+        """
+        if extension is None:
+            extension = ".pyx" if cython_header is not None else ".py"
+        if extension == ".py":
+            parsed = cls.parse_python_source(source)
+        else:
+            parsed = cls.parse_cython_source(
+                source.splitlines(), cython_header.splitlines() if cython_header is not None else None
+            )
+
+        return {
+            "classes": [
+                {
+                    "classname": c["name"],
+                    "imports": [
+                        cls.resolve_import_record(imp[1], module_name) for imp in c["imports"]
+                    ],
+                    "inherited": c["inherited"],
+                    "attributes": c["attributes"],
+                    "symbols": cls.strip_useless_symbols(c["symbols"] if list_symbols else [])
+                } for c in parsed["classes"]
+            ],
+            "imports": [
+                cls.resolve_import_record(imp[1], module_name) for imp in parsed["imports"]
+            ],
+            "extension": extension,
+            "instantiations": parsed["instantiations"]
+        }
+
     @classmethod
     def parse_cython(cls, file_path: str, cython_header: str | None = None):
         """
-        Utility function for parsing Cython (.pyx) files using regex.
+        Utility function for parsing Cython (.pyx) files, see `parse_cython_source`.
+        """
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            if cython_header is None:
+                return cls.parse_cython_source(f)
+            with open(cython_header, "r", encoding="utf-8", errors="ignore") as header:
+                return cls.parse_cython_source(f, header)
+
+    @classmethod
+    def parse_cython_source(cls, lines: 'Iterable[str]', header_lines: 'Iterable[str] | None' = None):
+        """
+        Parses the lines of a Cython (.pyx) file and of its .pxd header. The source is split
+        into logical lines by `CythonLexer`, and each line is classified once using regex.
         """
         results = {
             # {kind: str, name: str, line: int, functions: list, imports: list, attributes: list, symbols: list}
             "classes": [],          
             "functions": [],        # (name, kind, lineno), top level functions only
-            "imports": [],          # (type, code, lineno), top level imports only
+            "imports": [],          # (type, ImportRecord, lineno), top level imports only
             "instantiations": [],    # {name: str, func_name: str, type: str}
         }
 
-        class_pattern = re.compile(r"\s*(cdef\s+)?class\s+(\w+)")
-        func_pattern = re.compile(r"\s*(cpdef|def)\s+\w+\s+(\w+)\s*\(")
-        import_pattern = re.compile(r"\s*(from\s+[\w.]+\s+)?import\s+.*")
-        cimport_pattern = re.compile(r"\s*(from\s+[\w.]+\s+)?cimport\s+.*")
-        attribute_pattern = re.compile(r"\s*self\.(\w+)\s*=\s*([\w\.]+)\(")
-        call_pattern = re.compile(r"^(\w+)\s*=\s*([\w\.]+)\s*\(.*\)")
-        alias_pattern = re.compile(r"^(\w+)\s*=\s*([\w\.]+)\s*$")
-        token_pattern = r'[a-zA-Z0-9._]+'
-
-        if cython_header is not None:
-            with open(cython_header, "r", encoding="utf-8", errors="ignore") as f:
-                for line in f:
-                    if cimport_pattern.match(line) or import_pattern.match(line):
-                        if cimport_pattern.match(line):
-                            imp = ("cimport", line.strip(), 0)
-                        else:
-                            imp = ("import", line.strip(), 0)
-                        results["imports"].append(imp)
-                    
-
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            last_class = None
-            in_comment_block = False
-            for i, line in enumerate(f, 1):
-                if line.strip().startswith(('"""', 'r"""', 'f"""')):
-                    in_comment_block = not in_comment_block
-                if in_comment_block:
-                    continue
-
-                # Check for unindent
-                if line and not re.match(r'\s', line):
-                    last_class = None
-
-                # Class declarations
-                if match := class_pattern.match(line):
-                    last_class = {
-                        "symbols": [],
-                        "kind" : "cdef class" if match.group(1) else "class",
-                        "name": match.group(2),
-                        "line": i,
-                        "functions": [],
-                        "imports": [],
-                        "inherited": cls.extract_inheritance_from_cython(line),
-                        "attributes": []
-                    }
-                    results["classes"].append(last_class)
-
-                # Function declarations
-                elif match := func_pattern.match(line):
-                    kind = match.group(1)  # 'cpdef' or 'def'
-                    func = (match.group(2), kind, i)
-                    if last_class is None:
-                        results["functions"].append(func)
-                    else:
-                        last_class["functions"].append(func)
-
-                # Import / from-import
-                elif cimport_pattern.match(line) or import_pattern.match(line):
-                    if cimport_pattern.match(line):
-                        imp = ("cimport", line.strip(), i)
-                    else:
-                        imp = ("import", line.strip(), i)
-                    if last_class is None:
-                        results["imports"].append(imp)
-                    else:
-                        last_class["imports"].append(imp)
-
-                # attributes
-                elif match := attribute_pattern.match(line):
-                    class_call = match.group(2)
-                    if last_class is not None:
-                        last_class["attributes"].append(class_call)
-
-                # instantiations + alias
-                elif match := call_pattern.match(line):
-                    var, class_call = match.groups()
-                    results["instantiations"].append(
-                        {
-                            "name": var,
-                            "func_name": class_call,
-                            "type": "instantiates"
-                        }
-                    )
-                elif match := alias_pattern.match(line):
-                    var, class_call = match.groups()
-                    results["instantiations"].append(
-                        {
-                            "name": var,
-                            "func_name": class_call,
-                            "type": "alias"
-                        }
+        if header_lines is not None:
+            for line in CythonLexer(header_lines):
+                match = cls.CYTHON_LINE.match(line.code)
+                if match is not None and match.lastgroup == "import":
+                    kind = "cimport" if match.group("cimport") else "import"
+                    results["imports"].extend(
+                        (kind, record, 0) for record in cls.parse_import_line(line.code)
                     )
-                
+
+        last_class = None
+        for line in CythonLexer(lines):
+            code = line.code
+
+            # Check for unindent
+            if line.indent == 0:
+                last_class = None
+
+            match = cls.CYTHON_LINE.match(code)
+            kind = match.lastgroup if match is not None else None
+
+            # Class declarations
+            if kind == "class":
+                last_class = {
+                    "symbols": [],
+                    "kind" : "cdef class" if match.group("cdef") else "class",
+                    "name": match.group("class_name"),
+                    "line": line.lineno,
+                    "functions": [],
+                    "imports": [],
+                    "inherited": cls.extract_inheritance_from_cython(code),
+                    "attributes": []
+                }
+                results["classes"].append(last_class)
+
+            # Function declarations
+            elif kind == "function":
+                func = (match.group("function_name"), match.group("function_kind"), line.lineno)
+                if last_class is None:
+                    results["functions"].append(func)
+                else:
+                    last_class["functions"].append(func)
+
+            # Import / from-import
+            elif kind == "import":
+                import_kind = "cimport" if match.group("cimport") else "import"
+                imports = [(import_kind, record, line.lineno) for record in cls.parse_import_line(code)]
+                if last_class is None:
+                    results["imports"].extend(imports)
+                else:
+                    last_class["imports"].extend(imports)
+
+            # attributes
+            elif kind == "attribute":
                 if last_class is not None:
-                    last_class["symbols"].extend(
-                        re.findall(token_pattern, line)
-                    )
+                    last_class["attributes"].append(match.group("attribute_call"))
+
+            # instantiations + alias
+            elif kind == "instantiation" and line.indent == 0:
+                results["instantiations"].append(
+                    {
+                        "name": match.group("instance_name"),
+                        "func_name": match.group("instance_call"),
+                        "type": "instantiates"
+                    }
+                )
+            elif kind == "alias" and line.indent == 0:
+                results["instantiations"].append(
+                    {
+                        "name": match.group("alias_name"),
+                        "func_name": match.group("alias_target"),
+                        "type": "alias"
+                    }
+                )
+            
+            if last_class is not None:
+                last_class["symbols"].extend(cls.CYTHON_TOKEN.findall(code))
 
         return results
     
     @classmethod
     def parse_python(cls, file_path: str):
         """
-        Utility function for parsing Python (.py) files using the ast library.
+        Utility function for parsing Python (.py) files, see `parse_python_source`.
+        """
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            return cls.parse_python_source(f.read())
+
+    @classmethod
+    def parse_python_source(cls, source: str):
+        """
+        Parses the source of a Python (.py) file using the ast library.
         """
         results = {
             # {kind: str, name: str, line: int, functions: list, imports: list, attributes: list}
             "classes": [],         
             "functions": [],        # (name, kind, lineno), top level functions only
-            "imports": [],          # (type, code, lineno), top level imports only
+            "imports": [],          # (type, ImportRecord, lineno), top level imports only
             "instantiations": []    # {name: str, func_name: str, type: str}
         }
 
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            try:
-                tree = ast.parse(f.read())
-            except SyntaxError:
-                return results
-            
-        results["instantiations"] = cls.extract_top_level_instantiations_py(tree)
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:
+            return results
 
         for node in tree.body:
             # Top-level imports
-            if isinstance(node, (ast.Import, ast.ImportFrom)):
-                kind = "import" if isinstance(node, ast.Import) else "from-import"
-                code = ast.unparse(node)
-                results["imports"].append((kind, code, node.lineno))
-
-            # Lazy imports: top-level expression calls like lazy_import(...)
-            elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
-                call = node.value
-                if isinstance(call.func, ast.Name) and call.func.id == "lazy_import":
-                    if len(call.args) >= 2:
-                        results["imports"].append(("lazy-import", ast.unparse(node), node.lineno))
+            if imports := cls.get_import_entries(node):
+                results["imports"].extend(imports)
 
             # Top-level functions
             elif isinstance(node, ast.FunctionDef):
                 results["functions"].append((node.name, "def", node.lineno))
 
+            # Top-level instantiations and aliases
+            elif isinstance(node, ast.Assign):
+                results["instantiations"].extend(cls.extract_instantiations_from_assign(node))
+
             # Top-level classes
             elif isinstance(node, ast.ClassDef):
+                visitor = ClassBodyVisitor()
+                visitor.visit(node)
                 class_entry = {
-                    "symbols": cls.extract_symbolic_names(node),
+                    "symbols": sorted(visitor.symbols),
                     "kind": "class",
                     "name": node.name,
                     "line": node.lineno,
-                    "functions": [],
-                    "imports": [],
+                    "functions": visitor.functions,
+                    "imports": visitor.imports,
                     "inherited": [],
-                    "attributes": cls.extract_attributes_from_python(node)
+                    "attributes": visitor.attributes
                 }
                 for base in node.bases:
                     base_name = cls.get_full_name(base)
                     if base_name:
                         class_entry["inherited"].append(base_name)
 
-                for subnode in ast.walk(node):
-                    if isinstance(subnode, ast.FunctionDef):
-                        class_entry["functions"].append((subnode.name, "def", subnode.lineno))
-                    elif isinstance(subnode, (ast.Import, ast.ImportFrom)):
-                        kind = "import" if isinstance(subnode, ast.Import) else "from-import"
-                        code = ast.unparse(subnode)
-                        class_entry["imports"].append((kind, code, subnode.lineno))
-
                 results["classes"].append(class_entry)
     
         return results
-    
+
     @classmethod
-    def resolve_import(cls, import_line: str, current_path: str):
+    def get_import_entries(cls, node) -> 'List[tuple[str, ImportRecord, int]]':
         """
-        Gets module of import and any class names attached, or "*"
+        Returns the `(type, record, lineno)` entries of an import, from-import or
+        `lazy_import(...)` statement, or an empty list if `node` is none of these.
+        `import a, b` gives one entry per imported module.
         """
-        result = {
-            "full_module_path": None,
-            "classes_imported": [], # {classalias, classname}
-            "type": "import",
-            "alias": None
-        }
+        if isinstance(node, ast.Import):
+            return [
+                ("import", ImportRecord("import", name.name, 0, (), name.asname or name.name.split(".")[-1]), node.lineno)
+                for name in node.names
+            ]
+        if isinstance(node, ast.ImportFrom):
+            return [("from-import", cls._from_import_record("from-import", node), node.lineno)]
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            call = node.value
+            if isinstance(call.func, ast.Name) and call.func.id == "lazy_import" and len(call.args) >= 2:
+                record = cls._lazy_import_record(call)
+                if record is not None:
+                    return [("lazy-import", record, node.lineno)]
+        return []
+
+    @classmethod
+    def _from_import_record(cls, kind: str, node: ast.ImportFrom) -> 'ImportRecord':
+        if len(node.names) == 1 and node.names[0].name == "*":
+            names = "*"
+        else:
+            names = tuple((name.asname or name.name, name.name) for name in node.names)
+        return ImportRecord(kind, node.module or "", node.level, names, None)
+
+    @classmethod
+    def _lazy_import_record(cls, call: ast.Call) -> 'ImportRecord | None':
+        """
+        Builds the record of `lazy_import("module.path", names, [as_name="X"] or as_names=(...))`.
+        """
+        def constant_strings(node):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                return [node.value]
+            if isinstance(node, (ast.Tuple, ast.List)):
+                return [elt.value for elt in node.elts if isinstance(elt, ast.Constant) and isinstance(elt.value, str)]
+            return []
+
+        module_path = constant_strings(call.args[0])
+        if len(module_path) != 1:
+            return None
+        module_path = module_path[0]
+        symbols = constant_strings(call.args[1])
+
+        aliases = []
+        for keyword in call.keywords:
+            if keyword.arg in ("as_name", "as_names"):
+                aliases = constant_strings(keyword.value)
+
+        # Fallback to identity
+        if not aliases:
+            aliases = symbols
+
+        # Match lengths (defensive)
+        if len(symbols) != len(aliases):
+            print(f"Error parsing lazy import {ast.unparse(call)}")
+            return None
+
+        module = module_path.lstrip(".")
+        return ImportRecord(
+            "lazy-import",
+            module,
+            len(module_path) - len(module),
+            tuple(zip(aliases, symbols)),
+            module_path.split(".")[-1]
+        )
 
-        # Handle relative imports: from ..foo import Bar
-        def resolve_relative(module_str: str) -> str:
-            if module_str.startswith("."):
-                parts = current_path.split(".")
-                dots = len(module_str) - len(module_str.lstrip("."))
-                rel = module_str.lstrip(".")
-                resolved = ".".join(parts[: -dots] + ([rel] if rel else []))
-                return resolved
-            return module_str
-
-        # Normalize whitespace
+    @classmethod
+    def parse_import_line(cls, import_line: str) -> 'List[ImportRecord]':
+        """
+        Builds import records from the source of an import statement. Cython `cimport`
+        statements are read as imports and recorded as `cimport`/`from-cimport`.
+        """
         line = import_line.strip()
+        is_cimport = cls.CIMPORT_KEYWORD.search(line) is not None
+        if is_cimport:
+            line = cls.CIMPORT_KEYWORD.sub("import", line)
+        try:
+            tree = ast.parse(line)
+        except SyntaxError:
+            return []
+
+        records = []
+        for node in tree.body:
+            for kind, record, _ in cls.get_import_entries(node):
+                if is_cimport and kind != "lazy-import":
+                    record = record._replace(type="c" + kind if kind == "import" else "from-cimport")
+                records.append(record)
+        return records
 
-        # === from x.y import A, B as B_alias
-        match = re.match(r"from\s+([\w\.]+|(?:\.*[\w\.]*))\s+import\s+(.+)", line)
-        if match:
-            raw_mod = match.group(1)
-            imports = match.group(2).strip()
-            resolved_mod = resolve_relative(raw_mod)
-            result["full_module_path"] = resolved_mod
-            result["type"] = "from-import"
-
-            if imports == "*":
-                result["classes_imported"] = "*"
-            else:
-                pairs = {}
-                for item in imports.split(","):
-                    parts = item.strip().split(" as ")
-                    name = parts[0].strip()
-                    alias = parts[1].strip() if len(parts) > 1 else name
-                    pairs[alias] = name
-                result["classes_imported"] = pairs
-            return result
-
-        # === import x.y.z [as alias]
-        match = re.match(r"import\s+([\w\.]+)(?:\s+as\s+(\w+))?", line)
-        if match:
-            module_path = match.group(1)
-            alias = match.group(2) or module_path.split(".")[-1]
-            resolved_mod = resolve_relative(module_path)
-            result["full_module_path"] = resolved_mod
-            result["type"] = "import"
-            result["alias"] = alias
-            return result
-
-        # === from x.y cimport A, B as B_alias
-        match = re.match(r"from\s+([\w\.]+|(?:\.*[\w\.]*))\s+cimport\s+(.+)", line)
-        if match:
-            raw_mod = match.group(1)
-            imports = match.group(2).strip()
-            resolved_mod = resolve_relative(raw_mod)
-            result["full_module_path"] = resolved_mod
-            result["type"] = "from-cimport"
-
-            if imports == "*":
-                result["classes_imported"] = "*"
-            else:
-                pairs = {}
-                for item in imports.split(","):
-                    parts = item.strip().split(" as ")
-                    name = parts[0].strip()
-                    alias = parts[1].strip() if len(parts) > 1 else name
-                    pairs[alias] = name
-                result["classes_imported"] = pairs
-            return result
-
-        # === cimport x.y.z
-        match = re.match(r"cimport\s+([\w\.]+)", line)
-        if match:
-            module_path = match.group(1)
-            resolved_mod = resolve_relative(module_path)
-            result["full_module_path"] = resolved_mod
-            result["type"] = "cimport"
-            result["alias"] = module_path.split(".")[-1]
-            return result
-        
-        # === lazy_import("module.path", ..., [as_name="X"] or as_names=(...))
-        lazy_match = re.match(r'lazy_import\(\s*[\'"]([\w\.]+)[\'"]\s*,\s*(.+)', line)
-        if lazy_match:
-            module_path, symbols_raw = lazy_match.groups()
-            resolved_mod = resolve_relative(module_path)
-            symbols = []
-            aliases = []
-
-            # 1. Parse symbol list
-            if symbols_raw.strip().startswith("("):  # multiple symbols
-                symbol_match = re.findall(r'["\'](\w+)["\']', symbols_raw)
-                symbols = symbol_match
-            else:
-                single_match = re.match(r'["\'](\w+)["\']', symbols_raw)
-                if single_match:
-                    symbols = [single_match.group(1)]
-
-            # 2. Parse aliases if present
-            alias_match = re.search(r'as_name\s*=\s*["\'](\w+)["\']', line)
-            if alias_match:
-                aliases = [alias_match.group(1)]
-            else:
-                aliases = re.findall(r'as_names\s*=\s*\((.*?)\)', line)
-                if aliases:
-                    alias_list = re.findall(r'["\'](\w+)["\']', aliases[0])
-                    aliases = alias_list
-
-            # Fallback to identity
-            if not aliases:
-                aliases = symbols
-
-            # Match lengths (defensive)
-            if len(symbols) != len(aliases):
-                print(f"Error parsing lazy import {line}")
-                return None
-            
-            result["full_module_path"] = resolved_mod
-            result["type"] = "lazy-import"
-            result["alias"] = module_path.split(".")[-1]
-            result["classes_imported"] = {alias:symbol for symbol, alias in zip(symbols, aliases)}
-            return result
+    @classmethod
+    def resolve_import_record(cls, record: 'ImportRecord', current_path: str) -> dict:
+        """
+        Gets module of import and any class names attached, or "*". Relative imports are
+        resolved against `current_path`, the module the import appears in.
+
+        Results are memoized per `(record, package)`, as the same import statements repeat
+        across thousands of files. The memo is bounded, since `--watch` keeps parsing for the
+        life of the process. The returned dict is shared and must not be modified.
+        """
+        package = ".".join(current_path.split(".")[:-record.level]) if record.level else None
+        return cls._resolve_import_record(record, package)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=RESOLVED_IMPORTS_CACHE_SIZE)
+    def _resolve_import_record(record: 'ImportRecord', package: str | None) -> dict:
+        if package is None:
+            full_module_path = record.module
+        else:
+            full_module_path = ".".join(([package] if package else []) + ([record.module] if record.module else []))
+
+        if record.type in ("import", "cimport"):
+            classes_imported = []
+        elif record.names == "*":
+            classes_imported = "*"
+        else:
+            classes_imported = dict(record.names)
+
+        return {
+            "full_module_path": full_module_path,
+            "classes_imported": classes_imported, # {classalias: classname}
+            "type": record.type,
+            "alias": record.alias
+        }
 
-        return None  # unrecognized import
+    @classmethod
+    def resolve_import(cls, import_line: str, current_path: str):
+        """
+        Gets module of import and any class names attached, or "*", from the source of an
+        import statement. Returns `None` if the line is not a recognized import.
+        """
+        records = cls.parse_import_line(import_line)
+        if not records:
+            return None  # unrecognized import
+        return cls.resolve_import_record(records[0], current_path)
 
     @classmethod
     def get_full_name(cls, node):
@@ -415,13 +608,13 @@ class Parser:
         TODO: check if this is needed.
         """
         results = []
-        class_pattern = re.compile(r"^\s*(cdef\s+)?class\s+(\w+)\s*\((.*?)\)\s*:")
-        match = class_pattern.match(line)
+        match = cls.CYTHON_INHERITANCE.match(line)
         if match:
             base_classes = match.group(3)
             for base in base_classes.split(","):
                 base = base.strip()
-                if base:
+                # Skip keyword arguments such as metaclass=...
+                if base and "=" not in base:
                     results.append(base)
         return results
     
@@ -430,22 +623,9 @@ class Parser:
         """
         Get class attributes of a Python class.
         """
-        attr_classes = []
-
-        for node in ast.walk(class_node):
-            if isinstance(node, ast.Assign):
-                # Check LHS is self.<something>
-                if any(
-                    isinstance(t, ast.Attribute) and isinstance(t.value, ast.Name) and t.value.id == "self"
-                    for t in node.targets
-                ):
-                    value = node.value
-                    if isinstance(value, ast.Call):
-                        func_name = cls.get_full_name(value.func)
-                        if func_name is not None:
-                            attr_classes.append(func_name)
-                            
-        return attr_classes
+        visitor = ClassBodyVisitor()
+        visitor.visit(class_node)
+        return visitor.attributes
     
     @classmethod
     def extract_top_level_instantiations_py(cls, tree):
@@ -456,56 +636,101 @@ class Parser:
 
         for node in tree.body:
             if isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name):
-                        name = target.id
-                        if isinstance(node.value, ast.Call):
-                            # A = B(...)
-                            func_name = cls.get_full_name(node.value.func)
-                            if func_name is not None:
-                                assignments.append({
-                                    "name": name,
-                                    "func_name": func_name,
-                                    "type": "instantiates"
-                                })
-                        elif isinstance(node.value, ast.Name):
-                            # A = B
-                            assignments.append(
-                                {
-                                    "name": name,
-                                    "func_name": node.value.id,
-                                    "type": "alias"
-                                }
-                            )
+                assignments.extend(cls.extract_instantiations_from_assign(node))
+        return assignments
+
+    @classmethod
+    def extract_instantiations_from_assign(cls, node: ast.Assign):
+        """
+        Gets the instantiations (`A = B(...)`) and aliases (`A = B`) of a single assignment.
+        """
+        assignments = []
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                name = target.id
+                if isinstance(node.value, ast.Call):
+                    # A = B(...)
+                    func_name = cls.get_full_name(node.value.func)
+                    if func_name is not None:
+                        assignments.append({
+                            "name": name,
+                            "func_name": func_name,
+                            "type": "instantiates"
+                        })
+                elif isinstance(node.value, ast.Name):
+                    # A = B
+                    assignments.append(
+                        {
+                            "name": name,
+                            "func_name": node.value.id,
+                            "type": "alias"
+                        }
+                    )
         return assignments
     
     @classmethod
     def strip_useless_symbols(cls, symbols: List[str]):
-        return list(set(symbols).difference(cls.USELESS_SYMBOLS))
+        # Sorted so that the output does not depend on the hash seed of the parsing process
+        return sorted(set(symbols).difference(cls.USELESS_SYMBOLS))
     
     @classmethod
     def extract_symbolic_names(cls, node):
-        results = set()
-
-        class SymbolCollector(ast.NodeVisitor):
-            def visit_Name(self, n):
-                results.add(n.id)
-
-            def visit_Attribute(self, node):
-                # Recursively resolve dotted name like a.b.c
-                parts = []
-                while isinstance(node, ast.Attribute):
-                    parts.append(node.attr)
-                    node = node.value
-                if isinstance(node, ast.Name):
-                    parts.append(node.id)
-                    results.add(".".join(reversed(parts)))
-
-            def visit_Constant(self, node):
-                pass  # Ignore literals
-
-            def generic_visit(self, node):
-                super().generic_visit(node)
-
-        SymbolCollector().visit(node)
-        return sorted(results)
+        visitor = ClassBodyVisitor()
+        visitor.visit(node)
+        return sorted(visitor.symbols)
+
+
+class ClassBodyVisitor(ast.NodeVisitor):
+    """
+    Collects the symbols, `self.<attr> = Class(...)` instantiations, functions, imports
+    and lazy imports of a Python class in a single traversal of its tree.
+
+    Symbols are names and dotted names (`a.b.c`) referenced anywhere in the class. Literals
+    and the inner parts of dotted names are not symbols. Everything is collected in source order.
+    """
+    def __init__(self):
+        self.symbols = set()
+        self.attributes = []
+        self.functions = []
+        self.imports = []
+
+    def visit_Name(self, node):
+        self.symbols.add(node.id)
+
+    def visit_Attribute(self, node):
+        # Recursively resolve dotted name like a.b.c
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        if isinstance(node, ast.Name):
+            parts.append(node.id)
+            self.symbols.add(".".join(reversed(parts)))
+
+    def visit_Constant(self, node):
+        pass  # Ignore literals
+
+    def visit_Assign(self, node):
+        # Check LHS is self.<something>
+        if isinstance(node.value, ast.Call) and any(
+            isinstance(t, ast.Attribute) and isinstance(t.value, ast.Name) and t.value.id == "self"
+            for t in node.targets
+        ):
+            func_name = Parser.get_full_name(node.value.func)
+            if func_name is not None:
+                self.attributes.append(func_name)
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node):
+        self.functions.append((node.name, "def", node.lineno))
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        self.imports.extend(Parser.get_import_entries(node))
+
+    def visit_ImportFrom(self, node):
+        self.imports.extend(Parser.get_import_entries(node))
+
+    def visit_Expr(self, node):
+        self.imports.extend(Parser.get_import_entries(node))
+        self.generic_visit(node)
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import pickle
+from importlib import metadata
+from pathlib import Path
+from typing import Iterable, List
+
+from sagedeps.deps.data import Data
+from sagedeps.deps.model.importable import Importable
+
+
+def file_fingerprint(path: 'str | Path') -> list | None:
+    """
+    Returns `[path, mtime, size]` for an existing file, otherwise `None`.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [str(path), stat.st_mtime_ns, stat.st_size]
+
+def directory_fingerprint(root: 'str | Path', previous: list | None = None) -> list | None:
+    """
+    Returns `[[path, mtime], ...]` for every directory under `root`, or `None` if `root`
+    does not exist. Adding, removing or renaming a file changes the modification time of
+    its directory, so this tells whether the files of the tree changed with a `stat` per
+    directory instead of one per file. Files edited in place are not noticed.
+
+    If every directory of `previous`, an earlier result for `root`, still has the same
+    modification time, no directory was added or removed either, and `previous` is returned
+    without listing any directory.
+    """
+    root = str(root)
+    if not os.path.isdir(root):
+        return None
+    if previous and previous[0][0] == root:
+        try:
+            if all(os.stat(path).st_mtime_ns == mtime for path, mtime in previous):
+                return previous
+        except OSError:
+            pass
+
+    directories = []
+    pending = [root]
+    while pending:
+        path = pending.pop()
+        try:
+            directories.append([path, os.stat(path).st_mtime_ns])
+            with os.scandir(path) as entries:
+                pending.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+        except OSError:
+            continue
+    # The root sorts first, as every other path starts with it
+    directories.sort()
+    return directories
+
+def package_version() -> str | None:
+    """
+    Returns the installed version of sage-deps, or `None` if it is not installed.
+    """
+    try:
+        return metadata.version("sage-deps")
+    except metadata.PackageNotFoundError:
+        return None
+
+def code_fingerprint() -> str:
+    """
+    Returns a digest of the sources of `sagedeps.deps` and of its model, which build and
+    define the state held by a snapshot, so that a snapshot is only reused by the code it
+    was built with.
+    """
+    digest = hashlib.sha1()
+    deps_root = Path(__file__).parent
+    for path in sorted(deps_root.glob("*.py")) + sorted((deps_root / "model").glob("*.py")):
+        digest.update(path.name.encode() + b"\0" + path.read_bytes())
+    return digest.hexdigest()
+
+def _slot_names(model_type: type) -> list[str]:
+    return [name for klass in model_type.__mro__ for name in getattr(klass, "__slots__", ())]
+
+
+class Snapshot:
+    """
+    A file holding the fully built `Data` state (modules, classes, dependencies, scores,
+    references, commit metadata and documentation index) so the `Loader` can skip every
+    loading stage when none of its inputs changed.
+
+    The file holds three consecutive pickles: the fingerprint of the inputs it was built
+    from, the types of the model objects, and the state. Loading stops after the first one
+    if the fingerprint does not match. The model is a densely linked graph, which `pickle`
+    cannot walk recursively, so every `Importable` is pickled once as a flat
+    `(type, attributes)` entry and referenced by index everywhere else.
+    """
+    VERSION = 5
+    DATA_FIELDS = ["modules", "classes", "instantiations", "aliases", "commit_metadata", "rst_index", "graph"]
+    MODEL_TYPES = (Importable,)
+
+    def __init__(self, path: 'str | Path'):
+        self._path = Path(path)
+
+    def saved_fingerprint(self) -> dict | None:
+        """
+        Returns the fingerprint the snapshot was saved under, or `None` if there is none.
+        """
+        try:
+            with open(self._path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+            return None
+
+    def load(self, fingerprint: dict) -> dict | None:
+        """
+        Restores `Data` from the snapshot and returns the extra state that was saved with it,
+        or returns `None` without touching `Data` if the snapshot is missing or stale.
+        """
+        try:
+            with open(self._path, "rb") as f:
+                if pickle.load(f) != dict(fingerprint, version=self.VERSION):
+                    return None
+                types = pickle.load(f)
+                objects = [object_type.__new__(object_type) for object_type in types]
+                unpickler = pickle.Unpickler(f)
+                unpickler.persistent_load = objects.__getitem__
+                states, data, import_generation, extra = unpickler.load()
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+            print(f"Could not read snapshot {self._path}. Rebuilding it.")
+            return None
+
+        for model_object, state in zip(objects, states):
+            for name, value in state.items():
+                setattr(model_object, name, value)
+        for field in self.DATA_FIELDS:
+            setattr(Data, field, data[field])
+        # The cached import maps are stamped with the generation they were built at
+        Importable._import_generation = import_generation
+        return extra
+
+    def save(self, fingerprint: dict, extra: dict | None = None):
+        """
+        Saves the current `Data` state, along with `extra`, under `fingerprint`.
+        """
+        data = {field: getattr(Data, field) for field in self.DATA_FIELDS}
+        objects = self._collect_objects(data.values())
+        index = {id(model_object): i for i, model_object in enumerate(objects)}
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_name(self._path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(dict(fingerprint, version=self.VERSION), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump([type(model_object) for model_object in objects], f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickler = pickle.Pickler(f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickler.persistent_id = lambda value: (
+                index[id(value)] if isinstance(value, self.MODEL_TYPES) else None
+            )
+            pickler.dump((
+                [self._get_state(model_object) for model_object in objects], data, Importable._import_generation, extra or {}
+            ))
+        os.replace(tmp_path, self._path)
+
+    def _get_state(self, model_object) -> dict:
+        """
+        Returns the attributes of a model object, which are held in `__slots__`.
+        """
+        return {
+            name: getattr(model_object, name)
+            for name in _slot_names(type(model_object)) if hasattr(model_object, name)
+        }
+
+    def _collect_objects(self, roots: Iterable) -> List:
+        """
+        Returns every model object reachable from `roots` through attributes and containers.
+        """
+        objects = []
+        seen = set()
+        pending = list(roots)
+        while pending:
+            value = pending.pop()
+            if isinstance(value, self.MODEL_TYPES):
+                if id(value) in seen:
+                    continue
+                seen.add(id(value))
+                objects.append(value)
+                pending.extend(self._get_state(value).values())
+            elif isinstance(value, dict):
+                pending.extend(value.values())
+            elif isinstance(value, (list, tuple, set, frozenset)):
+                pending.extend(value)
+        return objects
@@ -0,0 +1,472 @@
+import json
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterable, List
+
+
+class ModuleStore:
+    """
+    Source of the parsed module map, i.e. the content of `modules.json` keyed by full
+    module name. The `Loader` reads modules through a store so the on-disk layout can
+    change without touching the loading stages.
+
+    Modules are grouped into packages: `sage.rings.integer` belongs to `sage.rings`, and
+    files directly under `sage` (such as `sage.all`) belong to `sage`. Stores that can
+    read packages separately only decode the packages that are asked for.
+    """
+    @classmethod
+    def package_of(cls, module_name: str) -> str:
+        parts = module_name.split(".")
+        if len(parts) > 2:
+            return ".".join(parts[:2])
+        return parts[0]
+
+    def packages(self) -> List[str]:
+        raise NotImplementedError(f"{self.__class__.__name__} is an abstract base class.")
+
+    def read(self, packages: 'Iterable[str] | None' = None) -> dict:
+        """
+        Returns the module map of the given packages, or of every package if `packages` is `None`.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} is an abstract base class.")
+
+    def packages_for(self, path: str) -> List[str]:
+        """
+        Returns the packages containing modules under `path` (for example `sage.rings.polynomial`
+        or `sage.combinat`).
+        """
+        packages = self.packages()
+        if path == "sage":
+            return packages
+        matches = [
+            package for package in packages
+            if package == path or (package != "sage" and path.startswith(package + "."))
+        ]
+        if not matches and self.package_of(path) in packages:
+            matches = [self.package_of(path)]
+        return matches
+
+    def source_files(self) -> List[Path]:
+        """
+        Returns the files the store reads from, or an empty list if it is not backed by files.
+        """
+        return []
+
+    def package_of_module(self, module_name: str) -> str | None:
+        """
+        Returns the package `module_name` would be stored in, if the store has that package.
+        """
+        package = self.package_of(module_name)
+        return package if package in self.packages() else None
+
+
+class MemoryStore(ModuleStore):
+    """
+    A module map that is already in memory.
+    """
+    def __init__(self, modules: dict | None):
+        self._modules = modules
+        self._packages = None
+
+    def _load(self) -> dict:
+        return self._modules
+
+    def packages(self) -> List[str]:
+        if self._packages is None:
+            self._packages = list(dict.fromkeys(self.package_of(name) for name in self._load()))
+        return self._packages
+
+    def read(self, packages: 'Iterable[str] | None' = None) -> dict:
+        modules = self._load()
+        if packages is None:
+            return modules
+        packages = set(packages)
+        return {name: module for name, module in modules.items() if self.package_of(name) in packages}
+
+
+class JsonStore(MemoryStore):
+    """
+    The monolithic `modules.json` file. It is decoded in full on first use.
+    """
+    def __init__(self, path: 'str | Path'):
+        super().__init__(None)
+        self._path = Path(path)
+
+    def source_files(self) -> List[Path]:
+        return [self._path]
+
+    def _load(self) -> dict:
+        if self._modules is None:
+            with open(self._path, "r") as f:
+                self._modules = json.loads(f.read())
+        return self._modules
+
+    @classmethod
+    def write(cls, path: 'str | Path', module_map: dict):
+        with open(path, "w+") as f:
+            f.write(json.dumps(module_map, indent=4))
+
+
+class ShardedStore(ModuleStore):
+    """
+    A directory with one JSON shard per package and a `manifest.json` listing them:
+
+        {
+            "version": 1,
+            "shards": {"<package>": "<shard file>", ...}
+        }
+
+    Shards are only decoded when one of their packages is read.
+    """
+    VERSION = 1
+    MANIFEST = "manifest.json"
+
+    def __init__(self, path: 'str | Path'):
+        self._path = Path(path)
+        with open(self._path/self.MANIFEST, "r") as f:
+            manifest = json.loads(f.read())
+        if manifest.get("version") != self.VERSION:
+            raise ValueError(f"Unsupported module store version in {self._path/self.MANIFEST}")
+        self._shards = manifest["shards"]
+        self._loaded = {}
+
+    @classmethod
+    def is_store(cls, path: 'str | Path') -> bool:
+        return (Path(path)/cls.MANIFEST).is_file()
+
+    def packages(self) -> List[str]:
+        return list(self._shards)
+
+    def source_files(self) -> List[Path]:
+        return [self._path/self.MANIFEST] + [self._path/shard for shard in self._shards.values()]
+
+    def _load_shard(self, package: str) -> dict:
+        if package not in self._loaded:
+            with open(self._path/self._shards[package], "r") as f:
+                self._loaded[package] = json.loads(f.read())
+        return self._loaded[package]
+
+    def read(self, packages: 'Iterable[str] | None' = None) -> dict:
+        if packages is None:
+            packages = self._shards
+        modules = {}
+        for package in packages:
+            if package in self._shards:
+                modules.update(self._load_shard(package))
+        return modules
+
+    @classmethod
+    def write(cls, path: 'str | Path', module_map: dict):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        shards = {}
+        for name, module in module_map.items():
+            shards.setdefault(cls.package_of(name), {})[name] = module
+
+        manifest = {"version": cls.VERSION, "shards": {}}
+        for package, shard in shards.items():
+            file_name = package + ".json"
+            with open(path/file_name, "w+") as f:
+                f.write(json.dumps(shard))
+            manifest["shards"][package] = file_name
+
+        with open(path/cls.MANIFEST, "w+") as f:
+            f.write(json.dumps(manifest, indent=4))
+
+
+class BinaryStore(MemoryStore):
+    """
+    Compact binary form of the module map. Every string (module paths, class names, symbols...)
+    is stored once in a string table and referenced by its index everywhere else. The file
+    layout, with all integers little-endian, is:
+
+        magic       8 bytes, b"SDEPSBIN"
+        header      version, word size (2 or 4), string count, string table size, data size
+        strings     UTF-8 strings separated by NUL bytes, padded to the word size
+        data        array of words (string references, counts and offsets)
+
+    Lists in the data section are stored as their length followed by their items. The data
+    starts with the module index, `count, (name, offset)*`, so single modules can be decoded
+    without decoding the others, followed by the import table, `count, offset*`. Each module
+    is then stored as
+
+        module      extension, imports, instantiations, classes
+        class       class name, imports, inherited, attributes, symbols
+        import      type, module path, alias, names kind, names
+
+    where `imports` are lists of indices in the import table, `instantiations` is a list of
+    `(name, func_name, type)` triples and the names of an import are a list of `(alias, name)`
+    pairs, a plain list or `*` depending on their kind. The largest word value is reserved
+    for `None`.
+
+    The same import statement often appears in many modules, so identical imports are stored
+    once and decoded into a single dictionary shared by every module using it.
+    """
+    VERSION = 1
+    MAGIC = b"SDEPSBIN"
+    HEADER = struct.Struct("<5I")
+    NAMES_LIST, NAMES_DICT, NAMES_ALL = range(3)
+
+    def __init__(self, path: 'str | Path'):
+        super().__init__(None)
+        self._path = Path(path)
+        self._strings = None
+        self._data = None
+        self._index = None
+        self._imports = None
+
+    @classmethod
+    def is_store(cls, path: 'str | Path') -> bool:
+        try:
+            with open(path, "rb") as f:
+                return f.read(len(cls.MAGIC)) == cls.MAGIC
+        except OSError:
+            return False
+
+    def source_files(self) -> List[Path]:
+        return [self._path]
+
+    def _open(self):
+        if self._data is not None:
+            return
+        with open(self._path, "rb") as f:
+            content = f.read()
+        offset = len(self.MAGIC)
+        if content[:offset] != self.MAGIC:
+            raise ValueError(f"{self._path} is not a binary module store")
+        version, width, n_strings, strings_size, data_size = self.HEADER.unpack_from(content, offset)
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported module store version in {self._path}")
+        offset += self.HEADER.size
+
+        strings = content[offset:offset + strings_size].decode("utf-8").split("\0")
+        self._strings = strings[:n_strings]
+        offset += strings_size + (-strings_size % width)
+
+        self._data = array("H" if width == 2 else "I")
+        self._data.frombytes(content[offset:offset + data_size*width])
+        if sys.byteorder == "big":
+            self._data.byteswap()
+        self._none = (1 << (8*width)) - 1
+
+        data = self._data
+        count = data[0]
+        self._index = {self._strings[data[i]]: data[i + 1] for i in range(1, 2*count + 1, 2)}
+        pos = 2*count + 1
+        self._import_offsets = data[pos + 1:pos + 1 + data[pos]]
+        self._imports = [None]*data[pos]
+
+    def packages(self) -> List[str]:
+        if self._packages is None:
+            self._open()
+            self._packages = list(dict.fromkeys(self.package_of(name) for name in self._index))
+        return self._packages
+
+    def _load(self) -> dict:
+        if self._modules is None:
+            self._open()
+            self._modules = {name: self._decode_module(offset) for name, offset in self._index.items()}
+        return self._modules
+
+    def read(self, packages: 'Iterable[str] | None' = None) -> dict:
+        if packages is None or self._modules is not None:
+            return super().read(packages)
+        self._open()
+        packages = set(packages)
+        return {
+            name: self._decode_module(offset) for name, offset in self._index.items()
+            if self.package_of(name) in packages
+        }
+
+    def _decode_module(self, pos: int) -> dict:
+        data, strings = self._data, self._strings
+        extension = strings[data[pos]]
+        imports, pos = self._decode_imports(pos + 1)
+
+        count = data[pos]
+        pos += 1
+        instantiations = []
+        for _ in range(count):
+            instantiations.append({
+                "name": strings[data[pos]],
+                "func_name": strings[data[pos + 1]],
+                "type": strings[data[pos + 2]]
+            })
+            pos += 3
+
+        count = data[pos]
+        pos += 1
+        classes = []
+        for _ in range(count):
+            classname = strings[data[pos]]
+            class_imports, pos = self._decode_imports(pos + 1)
+            inherited, pos = self._decode_strings(pos)
+            attributes, pos = self._decode_strings(pos)
+            symbols, pos = self._decode_strings(pos)
+            classes.append({
+                "classname": classname,
+                "imports": class_imports,
+                "inherited": inherited,
+                "attributes": attributes,
+                "symbols": symbols
+            })
+
+        return {
+            "classes": classes,
+            "imports": imports,
+            "extension": extension,
+            "instantiations": instantiations
+        }
+
+    def _decode_strings(self, pos: int) -> 'tuple[list, int]':
+        count = self._data[pos]
+        pos += 1
+        return list(map(self._strings.__getitem__, self._data[pos:pos + count])), pos + count
+
+    def _decode_imports(self, pos: int) -> 'tuple[list, int]':
+        count = self._data[pos]
+        pos += 1
+        imports = self._imports
+        result = []
+        for index in self._data[pos:pos + count]:
+            import_dict = imports[index]
+            if import_dict is None:
+                import_dict = imports[index] = self._decode_import(self._import_offsets[index])
+            result.append(import_dict)
+        return result, pos + count
+
+    def _decode_import(self, pos: int) -> dict:
+        data, strings = self._data, self._strings
+        alias = data[pos + 2]
+        kind = data[pos + 3]
+        if kind == self.NAMES_ALL:
+            names = "*"
+        elif kind == self.NAMES_DICT:
+            end = pos + 5 + 2*data[pos + 4]
+            names = dict(zip(
+                map(strings.__getitem__, data[pos + 5:end:2]),
+                map(strings.__getitem__, data[pos + 6:end:2])
+            ))
+        else:
+            names, _ = self._decode_strings(pos + 4)
+        return {
+            "full_module_path": strings[data[pos + 1]],
+            "classes_imported": names,
+            "type": strings[data[pos]],
+            "alias": None if alias == self._none else strings[alias]
+        }
+
+    @classmethod
+    def write(cls, path: 'str | Path', module_map: dict):
+        strings = {}
+        def ref(string: str | None):
+            if string is None:
+                return None
+            return strings.setdefault(string, len(strings))
+
+        def encode_strings(items: list, out: list):
+            out.append(len(items))
+            out.extend(ref(item) for item in items)
+
+        imports_table = {}
+        imports_body = []
+        def encode_import(import_dict: dict) -> int:
+            names = import_dict["classes_imported"]
+            key = (
+                import_dict["type"], import_dict["full_module_path"], import_dict["alias"],
+                names if isinstance(names, str) else tuple(names.items()) if isinstance(names, dict) else (tuple(names),)
+            )
+            index = imports_table.get(key)
+            if index is not None:
+                return index
+            imports_table[key] = index = len(imports_table)
+
+            out = [ref(import_dict["type"]), ref(import_dict["full_module_path"]), ref(import_dict["alias"])]
+            if names == "*":
+                out.append(cls.NAMES_ALL)
+            elif isinstance(names, dict):
+                out += [cls.NAMES_DICT, len(names)]
+                for alias, name in names.items():
+                    out += [ref(alias), ref(name)]
+            else:
+                out.append(cls.NAMES_LIST)
+                encode_strings(names, out)
+            imports_body.append(out)
+            return index
+
+        def encode_imports(imports: list, out: list):
+            out.append(len(imports))
+            out.extend(encode_import(import_dict) for import_dict in imports)
+
+        index = [len(module_map)]
+        body = []
+        for name, module in module_map.items():
+            index += [ref(name), len(body)]
+            body.append(ref(module["extension"]))
+            encode_imports(module["imports"], body)
+            body.append(len(module["instantiations"]))
+            for instantiation in module["instantiations"]:
+                body += [ref(instantiation["name"]), ref(instantiation["func_name"]), ref(instantiation["type"])]
+            body.append(len(module["classes"]))
+            for class_dict in module["classes"]:
+                body.append(ref(class_dict["classname"]))
+                encode_imports(class_dict["imports"], body)
+                encode_strings(class_dict["inherited"], body)
+                encode_strings(class_dict["attributes"], body)
+                encode_strings(class_dict["symbols"], body)
+
+        # Lay out the sections and turn relative positions into offsets in the data
+        import_offsets = []
+        offset = len(index) + 1 + len(imports_body)
+        for out in imports_body:
+            import_offsets.append(offset)
+            offset += len(out)
+        for i in range(2, len(index), 2):
+            index[i] += offset
+        data = index + [len(imports_body)] + import_offsets
+        for out in imports_body:
+            data += out
+        data += body
+        width = 2 if max(data, key=lambda word: -1 if word is None else word) < 0xFFFF else 4
+        none = (1 << (8*width)) - 1
+        words = array("H" if width == 2 else "I", (none if word is None else word for word in data))
+        if sys.byteorder == "big":
+            words.byteswap()
+
+        string_table = "\0".join(strings).encode("utf-8")
+        string_table += b"\0"*(-len(string_table) % width)
+        with open(path, "wb") as f:
+            f.write(cls.MAGIC)
+            f.write(cls.HEADER.pack(cls.VERSION, width, len(strings), len(string_table), len(words)))
+            f.write(string_table)
+            f.write(words.tobytes())
+
+
+STORE_FORMATS = {
+    "json": JsonStore,
+    "sharded": ShardedStore,
+    "binary": BinaryStore,
+}
+
+def open_store(path: 'str | Path') -> ModuleStore:
+    """
+    Opens the module store at `path`, which is either a `modules.json` file, a binary modules
+    file or a sharded store directory.
+    """
+    if ShardedStore.is_store(path):
+        return ShardedStore(path)
+    if BinaryStore.is_store(path):
+        return BinaryStore(path)
+    return JsonStore(path)
+
+def write_store(path: 'str | Path', module_map: dict, format: str = "json"):
+    STORE_FORMATS[format].write(path, module_map)
+
+def convert_store(source: 'str | Path', destination: 'str | Path', format: str = "json"):
+    """
+    Converts the module store at `source` to `format`, e.g. a binary store back to JSON for debugging.
+    """
+    write_store(destination, open_store(source).read(), format=format)
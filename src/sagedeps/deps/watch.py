@@ -0,0 +1,68 @@
+import os
+import time
+from pathlib import Path
+
+
+class SourceWatcher:
+    """
+    Polls the Sage source tree for added, changed and removed .py, .pyx and .pxd files.
+
+    Each poll is a single `os.scandir` walk of the tree. On most platforms the directory
+    listing already carries what `DirEntry.stat` needs, so a poll costs about one
+    `stat` per source file and no file is opened. A file counts as changed when its
+    `(mtime, size)` differs from the previous poll.
+    """
+    EXTENSIONS = (".py", ".pyx", ".pxd")
+
+    def __init__(self, root: 'str | Path', interval: float = 0.2):
+        self._root = str(root)
+        self._interval = interval
+        self._snapshot = self.scan()
+
+    def scan(self) -> dict[str, tuple[int, int]]:
+        """
+        Returns `{path: (mtime, size)}` for every source file under the root.
+        """
+        snapshot = {}
+        pending = [self._root]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.endswith(self.EXTENSIONS):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def poll(self) -> tuple[set[str], set[str]]:
+        """
+        Returns the files that were added or changed, and the files that were removed,
+        since the previous poll.
+        """
+        snapshot = self.scan()
+        changed = {path for path, stat in snapshot.items() if self._snapshot.get(path) != stat}
+        removed = self._snapshot.keys() - snapshot.keys()
+        self._snapshot = snapshot
+        return changed, removed
+
+    def wait(self) -> tuple[set[str], set[str]]:
+        """
+        Blocks until some source file changes. Changes are collected until the tree has been
+        quiet for one interval, so that saving several files at once gives a single update.
+        """
+        changed, removed = set(), set()
+        while True:
+            new_changed, new_removed = self.poll()
+            if not (new_changed or new_removed) and (changed or removed):
+                return changed, removed
+            changed = (changed - new_removed) | new_changed
+            removed = (removed - new_changed) | new_removed
+            time.sleep(self._interval)
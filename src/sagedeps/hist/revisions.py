@@ -0,0 +1,214 @@
+import json
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+import networkx as nx
+
+from sagedeps.constants import Settings
+from sagedeps.deps.data import Data
+from sagedeps.deps.loader import Loader
+from sagedeps.deps.model.dependency import Relation
+from sagedeps.deps.model.module import File
+from sagedeps.deps.parser import Parser
+from sagedeps.deps.store import MemoryStore
+
+
+class RevisionHistory:
+    """
+    Builds the class dependency graph of many revisions of the Sage git repository without
+    checking any of them out.
+
+    The files of a revision are listed with `git ls-tree`, which gives the object ID of
+    every blob. A module entry only depends on the module name and the blobs it was
+    parsed from (a .pyx file and its .pxd header), so entries are shared between all
+    revisions where those are the same, and each distinct blob is read with
+    `git cat-file --batch` and parsed only once. Since few files change between adjacent
+    revisions, building the graph of many revisions costs about as much parsing as
+    building one.
+    """
+    EDGE_TYPES = [
+        Relation.INHERITANCE,
+        Relation.CLASS_ATTRIBUTE,
+        Relation.DECLARED_TOP_IMPORT,
+        Relation.DECLARED_SUB_IMPORT
+    ]
+
+    def __init__(
+        self, repo: 'str | Path | None' = None, src_path: 'str | Path | None' = None,
+        list_symbols=True, prune_symbols=False, workers=1
+    ):
+        self._repo = Path(repo if repo is not None else Settings.SAGE_BASE)
+        src_path = Path(src_path if src_path is not None else Settings.SAGE_SRC)
+        if src_path.is_absolute():
+            src_path = src_path.relative_to(self._repo)
+        self._src_path = src_path.as_posix()
+        self._list_symbols = list_symbols
+        self._prune_symbols = prune_symbols
+        self._workers = workers
+
+        # {(module name, blob, header blob): module entry}
+        self._entries = {}
+        self.parsed_blobs = 0
+
+    def _git(self, *args) -> str:
+        return subprocess.run(
+            ["git", "-C", str(self._repo), *args], check=True, capture_output=True, text=True
+        ).stdout
+
+    def expand_revisions(self, revisions: Iterable[str]) -> List[str]:
+        """
+        Expands ranges such as `10.0..10.4` into the first-parent commits they contain,
+        oldest first. Other revisions are kept as they are.
+        """
+        expanded = []
+        for revision in revisions:
+            if ".." in revision:
+                expanded += self._git("rev-list", "--reverse", "--first-parent", revision).split()
+            else:
+                expanded.append(revision)
+        return expanded
+
+    def list_tree(self, revision: str) -> dict[str, str]:
+        """
+        Returns `{path: blob ID}` for the .py, .pyx and .pxd files of the Sage library at
+        `revision`, with paths relative to the library root.
+        """
+        tree = {}
+        prefix = self._src_path + "/"
+        output = self._git("ls-tree", "-r", "--full-tree", revision, "--", self._src_path)
+        for line in output.splitlines():
+            info, path = line.split("\t", 1)
+            _, object_type, object_id = info.split()
+            if object_type == "blob" and path.endswith((".py", ".pyx", ".pxd")):
+                tree[path[len(prefix):]] = object_id
+        return tree
+
+    def read_blobs(self, object_ids: Iterable[str]) -> dict[str, str]:
+        """
+        Reads the content of many blobs with a single `git cat-file --batch` process.
+        """
+        object_ids = list(dict.fromkeys(object_ids))
+        if not object_ids:
+            return {}
+        output = subprocess.run(
+            ["git", "-C", str(self._repo), "cat-file", "--batch"],
+            input="".join(object_id + "\n" for object_id in object_ids).encode(),
+            check=True, capture_output=True
+        ).stdout
+
+        blobs = {}
+        pos = 0
+        for object_id in object_ids:
+            end = output.index(b"\n", pos)
+            header = output[pos:end].split()
+            pos = end + 1
+            if header[1] == b"missing":
+                continue
+            size = int(header[2])
+            blobs[object_id] = output[pos:pos + size].decode("utf-8", errors="ignore")
+            pos += size + 1
+        return blobs
+
+    def module_class_map(self, revision: str) -> dict:
+        """
+        Returns the module map of `revision`, as `Parser.create_python_module_class_map`
+        would for a checkout of it. Only blobs that were not seen in an earlier revision
+        are parsed.
+        """
+        tree = self.list_tree(revision)
+        keys = {}
+        for path, object_id in tree.items():
+            root, extension = os.path.splitext(path)
+            if extension not in (".py", ".pyx"):
+                continue
+            module_name = ".".join(["sage"] + root.split("/"))
+            header_id = tree.get(root + ".pxd") if extension == ".pyx" else None
+            keys[module_name] = (module_name, object_id, header_id, extension)
+
+        missing = [key for key in dict.fromkeys(keys.values()) if key[:3] not in self._entries]
+        blobs = self.read_blobs(
+            object_id for key in missing for object_id in key[1:3] if object_id is not None
+        )
+        tasks = [
+            (module_name, blobs.get(object_id, ""), blobs.get(header_id) if header_id else None, extension)
+            for module_name, object_id, header_id, extension in missing
+        ]
+        for key, entry in zip(missing, self._parse(tasks)):
+            self._entries[key[:3]] = entry
+        self.parsed_blobs += len(missing)
+
+        module_class_map = {}
+        for module_name, key in keys.items():
+            entry = self._entries[key[:3]]
+            if self._prune_symbols:
+                entry = Parser.prune_module_symbols(entry)
+            module_class_map[module_name] = entry
+        return module_class_map
+
+    def _parse(self, tasks: list) -> Iterator[dict]:
+        list_symbols = [self._list_symbols]*len(tasks)
+        if self._workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                chunksize = max(1, len(tasks) // (self._workers * 8))
+                yield from executor.map(_parse_task, tasks, list_symbols, chunksize=chunksize)
+        else:
+            yield from map(_parse_task, tasks, list_symbols)
+
+    def metrics(self, top=10) -> dict:
+        """
+        Summary metrics of the currently loaded graph: number of classes and edges, the sizes
+        of its non-trivial strongly connected components (i.e. dependency cycles) and the
+        classes with the most dependents.
+        """
+        graph = nx.DiGraph()
+        for sage_class in Data.classes.values():
+            graph.add_node(sage_class.full_path_name)
+            for dependency in sage_class.get_dependencies(self.EDGE_TYPES):
+                graph.add_edge(sage_class.full_path_name, dependency.target.full_path_name)
+
+        scc_sizes = sorted(
+            (len(component) for component in nx.strongly_connected_components(graph) if len(component) > 1),
+            reverse=True
+        )
+        fan_in = sorted(graph.in_degree(), key=lambda item: (-item[1], item[0]))[:top]
+        return {
+            "modules": sum(1 for module in Data.modules.values() if isinstance(module, File)),
+            "classes": graph.number_of_nodes(),
+            "edges": graph.number_of_edges(),
+            "scc_sizes": scc_sizes,
+            "top_fan_in": [[name, degree] for name, degree in fan_in],
+        }
+
+    def run(self, revisions: Iterable[str], top=10) -> Iterator[dict]:
+        """
+        Yields the metrics of each revision, in order.
+        """
+        for revision in self.expand_revisions(revisions):
+            commit = self._git("rev-parse", "--verify", revision + "^{commit}").strip()
+            date = self._git("show", "-s", "--format=%cs", commit).strip()
+            Loader.reload(MemoryStore(self.module_class_map(revision)))
+            yield {"revision": revision, "commit": commit, "date": date, **self.metrics(top)}
+
+
+def _parse_task(task: tuple, list_symbols: bool) -> dict:
+    module_name, source, cython_header, extension = task
+    return Parser.parse_module_source(
+        module_name, source, cython_header, extension=extension, list_symbols=list_symbols
+    )
+
+def dump_history(revisions: Iterable[str], out_file: 'str | Path', **kwargs):
+    """
+    Writes the metrics of each revision to `out_file` as JSON lines, one revision per line.
+    """
+    history = RevisionHistory(**kwargs)
+    with open(out_file, "w") as f:
+        for metrics in history.run(revisions):
+            f.write(json.dumps(metrics, separators=(",", ":")) + "\n")
+            f.flush()
+            print(
+                f"{metrics['revision']}: {metrics['classes']} classes, {metrics['edges']} edges "
+                f"({history.parsed_blobs} files parsed so far)"
+            )
@@ -1,5 +1,6 @@
 import functools
 import json
+import os
 import threading
 import time
 import webbrowser
@@ -9,10 +10,15 @@ from pathlib import Path
 
 from sagedeps.analysis import *
 from sagedeps.constants import Settings
+from sagedeps.deps.cache import ParseCache
 from sagedeps.deps.parser import Parser
 from sagedeps.deps.loader import Loader
 from sagedeps.deps.graphics import create_class_digraph, create_module_digraph, create_graph_json
 from sagedeps.deps.score import DefaultScorer
+from sagedeps.deps.snapshot import Snapshot
+from sagedeps.deps.store import STORE_FORMATS, convert_store, open_store, write_store
+from sagedeps.deps.watch import SourceWatcher
+from sagedeps.hist.revisions import dump_history
 from sagedeps.deps.filter import (
     EmptyFilter, PathFilter, MinFanIn, MinFanOut, Or, Not, NameContains, Balance, DistanceFilter, from_json_file
 )
@@ -57,11 +63,12 @@ def get_default_filter():
             )
         )
 
-def create_module_class_map(out_file, testing=False):
-    class_map = Parser.create_python_module_class_map(list_symbols=not testing)
-    class_map_json = json.dumps(class_map, indent=4)
-    with open(out_file, "w+") as f: 
-        f.write(class_map_json)
+def create_module_class_map(out_file, testing=False, workers=1, use_cache=True, format="json", prune_symbols=False):
+    cache = ParseCache(Settings.PARSE_CACHE, version=Parser.VERSION) if use_cache else None
+    class_map = Parser.create_python_module_class_map(
+        list_symbols=not testing, workers=workers, cache=cache, prune_symbols=prune_symbols
+    )
+    write_store(out_file, class_map, format=format)
 
 def create_import_map(out_file):
     import_map = Loader.dump_import_map(split=True)
@@ -75,15 +82,18 @@ def create_dependencies(out_file):
         f.write(dependencies_map_json)
     
 def show_module_graph(depth=3, path="sage"):
-    create_module_digraph(depth=depth, path=path)
+    return create_module_digraph(depth=depth, path=path)
 
 def generate_graph(out_file=Settings.GRAPH_JSON, filter=get_default_filter()):
     result = create_graph_json(
         filter
     )
 
-    with open(out_file, "w") as f:
+    # Replaced atomically, so the viewer never reads a partly written graph in watch mode
+    tmp_file = str(out_file) + ".tmp"
+    with open(tmp_file, "w") as f:
         f.write(json.dumps(result, indent=4))
+    os.replace(tmp_file, out_file)
 
 def generate_tree(source, distance, direction, out_file=Settings.GRAPH_DIR/"tree.json"):
     filter = DistanceFilter(
@@ -96,6 +106,41 @@ def generate_tree(source, distance, direction, out_file=Settings.GRAPH_DIR/"tree
     with open(out_file, "w") as f:
         f.write(json.dumps(result, indent=4))
 
+def watch_sources(modules_source, graph_file, filter, use_cache=True, prune_symbols=False, interval=0.2):
+    """
+    Re-parses Sage files as they change, applies the changes to the loaded graph (see
+    `Loader.update`) and rewrites `graph_file`. Runs until interrupted.
+    """
+    cache = ParseCache(Settings.PARSE_CACHE, version=Parser.VERSION) if use_cache else None
+    module_class_map = open_store(modules_source).read()
+    watcher = SourceWatcher(Settings.SAGE_SRC, interval=interval)
+    generate_graph(graph_file, filter=filter)
+    print(f"Watching {Settings.SAGE_SRC} for changes. Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            changed, removed = watcher.wait()
+            start = time.time()
+            previous = dict(module_class_map)
+            updated = Parser.update_module_class_map(
+                module_class_map, changed, removed, cache=cache, prune_symbols=prune_symbols
+            )
+            if not updated:
+                continue
+            Loader.update(
+                module_class_map,
+                {module_name: previous[module_name] for module_name in updated if module_name in previous},
+                updated,
+                scorer=DefaultScorer()
+            )
+            generate_graph(graph_file, filter=filter)
+            print(f"Updated {', '.join(updated)} in {time.time() - start:.2f}s.")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cache is not None:
+            cache.save()
+
 def run_graph_analysis(analyzer: GraphAnalyzer):
     return analyzer.run()
 
@@ -178,6 +223,59 @@ def main():
         dest="generate_modules", 
         help="Generate a modules file. Will output to default location or `--modules-source`."
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        metavar="WORKERS",
+        dest="jobs",
+        help="Number of processes used to parse files with `--generate-modules`. Use 0 for one per core."
+    )
+    parser.add_argument(
+        "--no-parse-cache",
+        action="store_true",
+        dest="no_parse_cache",
+        help="Re-parse every file with `--generate-modules` instead of reusing the parse cache."
+    )
+    parser.add_argument(
+        "--prune-symbols",
+        action="store_true",
+        dest="prune_symbols",
+        help="With `--generate-modules`, only keep the class symbols that can match an import."
+    )
+    parser.add_argument(
+        "--modules-format",
+        choices=list(STORE_FORMATS),
+        default="json",
+        dest="modules_format",
+        help="Format written by `--generate-modules` and `-convert-modules`. `sharded` writes a directory with one file per package, `binary` a compact binary file."
+    )
+    parser.add_argument(
+        "-convert-modules",
+        nargs=2,
+        metavar=("SOURCE", "DESTINATION"),
+        dest="convert_modules",
+        help="Converts the modules file SOURCE to the format given by `--modules-format`."
+    )
+    parser.add_argument(
+        "--no-snapshot",
+        action="store_true",
+        dest="no_snapshot",
+        help="Rebuild the dependency graph instead of loading it from the snapshot of the previous run."
+    )
+    parser.add_argument(
+        "--scope",
+        nargs="+",
+        metavar="PACKAGE",
+        dest="scope",
+        help="Only load the given packages (e.g. sage.rings). Other packages are loaded when imported."
+    )
+    parser.add_argument(
+        "--inherit-dependencies",
+        action="store_true",
+        dest="inherit_dependencies",
+        help="Make each class also depend on everything the classes it inherits from depend on."
+    )
     parser.add_argument(
         "-gi", "--generate-imports",
         action="store_true",
@@ -222,6 +320,19 @@ def main():
         dest="show_view",
         help="Run a cytoscape.js instance. Specify graph source using `--graph-source`."
     )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        dest="watch",
+        help="Re-parse Sage files as they change and keep `--graph-source` up to date. Can be combined with `-view`."
+    )
+    parser.add_argument(
+        "-history",
+        nargs="+",
+        metavar="REVISION",
+        dest="history",
+        help="Computes graph metrics for each git REVISION of Sage (tags, commits or ranges such as `10.0..10.4`)."
+    )
     parser.add_argument(
         "-set-config",
         nargs=2,
@@ -233,17 +344,47 @@ def main():
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output.")
     
     args = parser.parse_args()
+    if args.jobs < 0:
+        parser.error(f"argument -j/--jobs: must be 0 or more, got {args.jobs}")
+    workers = args.jobs if args.jobs > 0 else os.cpu_count()
 
     result = ""
 
     if args.set_config:
         Settings.set_config(args.set_config[0], args.set_config[1])
 
+    if args.convert_modules:
+        convert_store(
+            resolve_file(args.convert_modules[0]),
+            resolve_file(args.convert_modules[1]),
+            format=args.modules_format
+        )
+
+    if args.history:
+        dump_history(
+            args.history,
+            Settings.HISTORY_JSON,
+            workers=workers,
+            prune_symbols=args.prune_symbols
+        )
+
     verbose = args.verbose
     if args.generate_modules:
-        create_module_class_map(resolve_file(args.modules_source))
+        create_module_class_map(
+            resolve_file(args.modules_source),
+            workers=workers,
+            use_cache=not args.no_parse_cache,
+            format=args.modules_format,
+            prune_symbols=args.prune_symbols
+        )
     
-    Loader.initialize(scorer=DefaultScorer())
+    Loader.initialize(
+        scorer=DefaultScorer(),
+        packages=args.scope,
+        store=open_store(resolve_file(args.modules_source)),
+        snapshot=None if args.no_snapshot else Snapshot(Settings.SNAPSHOT),
+        inherit_dependencies=args.inherit_dependencies
+    )
     if args.no_filter:
         filter = EmptyFilter()
     else:
@@ -293,7 +434,19 @@ def main():
 
     if args.show_view:
         threading.Thread(target=open_browser, daemon=True, args=[resolve_file(args.graph_source)]).start()
-        run_server()
+        if args.watch:
+            threading.Thread(target=run_server, daemon=True).start()
+        else:
+            run_server()
+
+    if args.watch:
+        watch_sources(
+            resolve_file(args.modules_source),
+            resolve_file(args.graph_source),
+            filter,
+            use_cache=not args.no_parse_cache,
+            prune_symbols=args.prune_symbols
+        )
 
     if args.output_file:
         with open(resolve_file(args.output_file), "w+") as f: